@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import time
+import aiohttp
+from notion_client import (
+    NOTION_API_URL,
+    NOTION_VERSION,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    RateLimiter,
+    RetryPolicy
+)
+
+logger = logging.getLogger('async_notion_client')
+
+
+class AsyncNotionResponse:
+    """
+    Fully read response exposing the same attributes the scripts use on requests responses
+    """
+
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncNotionClient:
+    """
+    Asyncio counterpart of NotionClient sharing its rate limiter and retry policy
+    """
+
+    def __init__(
+        self,
+        token,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        rate_limiter=None,
+        retry_policy=None,
+        cassette=None
+    ):
+        self.pool_size = pool_size
+        self.cassette = cassette
+        connect_timeout, read_timeout = timeout
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+
+        # Notion API headers
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        }
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        self.session = aiohttp.ClientSession(headers=self.headers, timeout=self.timeout, connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Close all pooled connections
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def url(self, path):
+        """
+        Build a full API URL from a path, leaving absolute URLs untouched
+        """
+        if path.startswith("http"):
+            return path
+        return f"{NOTION_API_URL}/{path.lstrip('/')}"
+
+    async def _send(self, method, url, kwargs):
+        """
+        Send one request, or serve it from the cassette when replaying
+        """
+        if self.cassette is not None and self.cassette.replaying:
+            entry = self.cassette.play(method, url, kwargs)
+            delay = self.cassette.delay(entry)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return AsyncNotionResponse(entry["status"], entry["headers"], entry["text"])
+
+        # Replayed responses never reach the API, so only live requests are rate limited
+        wait = self.rate_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        started = time.monotonic()
+        async with self.session.request(method, url, **kwargs) as raw_response:
+            text = await raw_response.text()
+            response = AsyncNotionResponse(raw_response.status, raw_response.headers, text)
+        if self.cassette is not None:
+            self.cassette.record(method, url, kwargs, response.status_code, response.headers, text, time.monotonic() - started)
+        return response
+
+    async def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a rate-limited request, retrying 429 and 5xx responses like NotionClient.request
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+        url = self.url(path)
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, url, kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Only connection failures are known not to have reached the server
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or not self.retry_policy.take(attempt, idempotent):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.warning(f"{method} {url} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if not self.retry_policy.retryable(response.status_code, idempotent):
+                    return response
+                if not self.retry_policy.take(attempt, idempotent):
+                    return response
+                delay = self.retry_policy.delay(attempt, response)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def patch(self, path, **kwargs):
+        return await self.request("PATCH", path, **kwargs)
@@ -0,0 +1,146 @@
+import os
+import atexit
+import gzip
+import json
+import logging
+import shutil
+import tempfile
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlencode, urlsplit
+
+logger = logging.getLogger('cassette')
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Response headers worth keeping; the scripts only look at these
+RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+
+def scratch_cache_dir():
+    """
+    Temporary cache directory for a cassette run, removed at exit
+
+    Recording and replaying both start from empty local state, so a replay makes
+    the same requests as its recording and neither touches the real caches.
+    """
+    path = tempfile.mkdtemp(prefix="notion-cassette-")
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+
+class CassetteMiss(Exception):
+    """
+    Raised in replay mode for a request the cassette has no (more) responses for
+    """
+
+
+def request_key(method, url, kwargs):
+    """
+    Identify a request by method, URL path with query parameters and canonical JSON body
+
+    The host is left out so cassettes stay valid behind a proxy or test server.
+    """
+    parts = urlsplit(url)
+    target = parts.path
+    params = kwargs.get("params")
+    if params:
+        target = f"{target}?{urlencode(params)}"
+
+    body = None
+    if kwargs.get("json") is not None:
+        body = kwargs["json"]
+    elif kwargs.get("data"):
+        body = json.loads(kwargs["data"])
+
+    return f"{method} {target} {json.dumps(body, sort_keys=True, separators=(',', ':'))}"
+
+
+class Cassette:
+    """
+    Gzipped JSON-lines file of Notion request/response pairs for record and replay
+
+    In record mode every response is kept in memory and written on save(). In
+    replay mode identical requests are answered in the order they were recorded,
+    after the original latency or immediately. meta is saved as the first line
+    and holds run settings a replay needs, such as the recorded day.
+    """
+
+    def __init__(self, path, mode, original_latency=True):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.original_latency = original_latency
+        self.lock = threading.Lock()
+        self.entries = []
+        self.responses = defaultdict(deque)
+        self.meta = {}
+
+        if mode == REPLAY:
+            self.load()
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "meta" in entry:
+                    self.meta = entry["meta"]
+                    continue
+                self.responses[entry["key"]].append(entry)
+        logger.info(f"Loaded {sum(len(queue) for queue in self.responses.values())} responses from cassette {self.path}")
+
+    def save(self):
+        """
+        Write the recorded responses (record mode only)
+        """
+        if self.mode != RECORD:
+            return
+        with self.lock:
+            entries = list(self.entries)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"meta": self.meta}, separators=(",", ":")) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(entries)} responses to cassette {self.path}")
+
+    def record(self, method, url, kwargs, status_code, headers, text, elapsed):
+        entry = {
+            "key": request_key(method, url, kwargs),
+            "status": status_code,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            "text": text,
+            "elapsed": round(elapsed, 4)
+        }
+        with self.lock:
+            self.entries.append(entry)
+
+    def play(self, method, url, kwargs):
+        """
+        Next recorded response for this request as a dict with status, headers, text and elapsed
+        """
+        key = request_key(method, url, kwargs)
+        with self.lock:
+            queue = self.responses.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response for {key[:200]}")
+            return queue.popleft()
+
+    def delay(self, entry):
+        """
+        Seconds to wait before serving a replayed response
+        """
+        return entry["elapsed"] if self.original_latency else 0.0
@@ -1,9 +1,15 @@
 import os
+import atexit
 import logging
 import json
-import requests
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
+from cassette import RECORD, Cassette, scratch_cache_dir
+from notion_client import NotionClient, NotionAPIError, RateLimiter, RetryPolicy
+from mirror import open_mirror
+from occupancy_index import OccupancyIndex, occupancy_index_path
+from run_fingerprint import clear_run_fingerprint
 
 # Configure logging 
 logging.basicConfig(
@@ -23,6 +29,27 @@ load_dotenv()
 NOTION_API_TOKEN = os.getenv("NOTION_API_TOKEN")
 DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
 
+# Configuration
+HTTP_POOL_SIZE = int(os.getenv("NOTION_POOL_SIZE", "10"))  # Keep-alive connections to the Notion API
+RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))  # Average API requests per second
+RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))  # Requests allowed back-to-back after idling
+READ_RETRIES = int(os.getenv("NOTION_READ_RETRIES", "5"))  # Retries per idempotent API call
+WRITE_RETRIES = int(os.getenv("NOTION_WRITE_RETRIES", "2"))  # Retries per page creation
+RUN_RETRIES = int(os.getenv("NOTION_RUN_RETRIES", "50"))  # Retries allowed for the whole run
+QUERY_PAGE_SIZE = 100  # Results per database query page (Notion maximum)
+CACHE_DIR = os.getenv("NOTION_CACHE_DIR", ".cache")  # Directory for on-disk caches
+CASSETTE_PATH = os.getenv("NOTION_CASSETTE_PATH", "")  # Record/replay file for API traffic; empty disables it
+CASSETTE_MODE = os.getenv("NOTION_CASSETTE_MODE", "replay")  # "record" or "replay"
+CASSETTE_LATENCY = os.getenv("NOTION_CASSETTE_LATENCY", "original")  # Replay with "original" or "zero" latency
+MIRROR_PATH = os.getenv("NOTION_MIRROR_PATH", "")  # SQLite mirror of the database; empty disables it
+MIRROR_FULL_SYNC_INTERVAL = int(os.getenv("NOTION_MIRROR_FULL_SYNC_INTERVAL", "86400"))  # Seconds between full syncs
+
+# Cassette runs keep their local state in a throwaway directory, away from the real caches
+if CASSETTE_PATH:
+    CACHE_DIR = scratch_cache_dir()
+    if MIRROR_PATH:
+        MIRROR_PATH = os.path.join(CACHE_DIR, "mirror.db")
+
 # Log configuration details
 logger.info(f"Starting Notion Task Cleaner")
 logger.info(f"Database ID: {DATABASE_ID}")
@@ -31,12 +58,42 @@ if not NOTION_API_TOKEN:
 if not DATABASE_ID:
     logger.error("NOTION_DATABASE_ID not found in environment variables")
 
-# Notion API headers
-headers = {
-    "Authorization": f"Bearer {NOTION_API_TOKEN}",
-    "Content-Type": "application/json",
-    "Notion-Version": "2022-06-28"
-}
+# Persistent per-day task counts shared with main.py
+occupancy_index = OccupancyIndex(occupancy_index_path(CACHE_DIR, DATABASE_ID))
+
+# Local SQLite mirror, opened and synced on first use
+mirror = None
+mirror_lock = threading.Lock()
+
+# Optional cassette recording or replaying every API call
+cassette = None
+if CASSETTE_PATH:
+    cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, original_latency=CASSETTE_LATENCY != "zero")
+    if CASSETTE_MODE == RECORD:
+        atexit.register(cassette.save)
+
+# Shared Notion API client with pooled keep-alive connections
+client = NotionClient(
+    NOTION_API_TOKEN,
+    pool_size=HTTP_POOL_SIZE,
+    rate_limiter=RateLimiter(rate=RATE_LIMIT, burst=RATE_BURST),
+    retry_policy=RetryPolicy(read_retries=READ_RETRIES, write_retries=WRITE_RETRIES, run_retries=RUN_RETRIES),
+    cassette=cassette
+)
+
+def get_mirror():
+    """
+    Open the local mirror and sync it once per run, or return None when it is disabled or unavailable
+    """
+    global mirror
+    
+    if not MIRROR_PATH:
+        return None
+    
+    with mirror_lock:
+        if mirror is None:
+            mirror = open_mirror(MIRROR_PATH, client, DATABASE_ID, MIRROR_FULL_SYNC_INTERVAL) or False
+        return mirror or None
 
 def get_templated_tasks_with_dates():
     """
@@ -64,19 +121,26 @@ def get_templated_tasks_with_dates():
         }
     }
     
+    # Answer from the local mirror when it is enabled
+    local_mirror = get_mirror()
+    if local_mirror:
+        results = local_mirror.pages_with_date("Templated task")
+        logger.info(f"Successfully fetched {len(results)} templated tasks with dates from the mirror")
+        return results
+    
     logger.info(f"Fetching templated tasks with dates from database: {DATABASE_ID}")
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        data = response.json()
-        
-        if response.status_code != 200:
-            logger.error(f"Error fetching tasks: {data}")
-            return []
+        results = []
+        # Only the id and the Task title are used, and a title property's ID is always "title"
+        for page_results in client.query_pages(url, payload, page_size=QUERY_PAGE_SIZE, filter_properties=["title"]):
+            results.extend(page_results)
         
-        results = data.get("results", [])
         logger.info(f"Successfully fetched {len(results)} templated tasks with dates")
         return results
+    except NotionAPIError as e:
+        logger.error(f"Error fetching tasks: {e.body}")
+        return []
     except Exception as e:
         logger.exception(f"Exception when fetching tasks: {str(e)}")
         return []
@@ -91,10 +155,21 @@ def delete_task(task_id, task_name):
     
     try:
         # Notion API doesn't actually delete pages, it archives them
-        response = requests.patch(url, headers=headers, json={"archived": True})
+        response = client.patch(url, json={"archived": True}, idempotent=True)
         
         if response.status_code == 200:
             logger.info(f"Successfully deleted task: {task_name}")
+            
+            # The archive response carries the page, so free its day in the occupancy index
+            data = response.json()
+            date_prop = data.get("properties", {}).get("Date", {}).get("date") or {}
+            if date_prop.get("start"):
+                occupancy_index.add(date_prop["start"].split("T")[0], -1, task_id, data.get("last_edited_time"))
+            
+            # Archived pages never come back from queries, so drop them from the mirror here
+            local_mirror = get_mirror()
+            if local_mirror:
+                local_mirror.remove_page(task_id)
             return True
         else:
             logger.error(f"Error deleting task: {task_name}")
@@ -153,6 +228,10 @@ def main():
             if delete_task(task_id, task_name):
                 successful_deletions += 1
         
+        # Archived pages are invisible to main.py's change detection, so force its next run
+        if successful_deletions:
+            clear_run_fingerprint(CACHE_DIR, DATABASE_ID)
+        
         logger.info(f"Task deletion complete. Successfully deleted {successful_deletions} of {len(tasks)} tasks.")
         print(f"Successfully deleted {successful_deletions} of {len(tasks)} tasks.")
         
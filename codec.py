@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger('property_codec')
+
+# Properties set explicitly by create_task or read separately from templates
+RESERVED_PROPERTIES = ("Task", "Task Type", "Date", "Regularity (days)")
+
+
+class TemplateTask:
+    """
+    Compact record of one template: id, name, regularity, weight and its encoded properties
+
+    properties is a tuple of (property name, encoded value) pairs in schema order.
+    weight is the template's share of days where the daily cap binds.
+    payload_template holds the pre-serialized create payload once compiled.
+    """
+
+    __slots__ = ("id", "name", "regularity", "weight", "properties", "payload_template")
+
+    def __init__(self, task_id, name, regularity, properties=(), payload_template=None, weight=1):
+        self.id = task_id
+        self.name = name
+        self.regularity = regularity
+        self.weight = weight
+        self.properties = properties
+        self.payload_template = payload_template
+
+    def __repr__(self):
+        return f"TemplateTask(id={self.id!r}, name={self.name!r}, regularity={self.regularity!r}, weight={self.weight!r})"
+
+
+class TemplateCache:
+    """
+    Bounded LRU cache of extracted templates keyed by (page id, last_edited_time, codec plan)
+
+    A page whose last_edited_time changed, or a new schema, misses and is extracted again.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            template = self.entries.get(key)
+            if template is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return template
+
+    def put(self, key, template):
+        with self.lock:
+            self.entries[key] = template
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Encoders take a template's property value object (or None when the page lacks it)
+# and return the value to send for the new page, or None to leave it out.
+
+def encode_checkbox(prop):
+    return {"checkbox": prop.get("checkbox", False) if prop else False}
+
+
+def encode_rich_text(prop):
+    return {"rich_text": prop.get("rich_text", []) if prop else []}
+
+
+def encode_url(prop):
+    # For URL fields, use null instead of empty string
+    return {"url": (prop.get("url") if prop else None) or None}
+
+
+def encode_select(prop):
+    select_data = prop.get("select") if prop else None
+    name = select_data.get("name") if select_data else None
+    return {"select": {"name": name}} if name else None
+
+
+def encode_date(prop):
+    date_data = prop.get("date") if prop else None
+    start = date_data.get("start") if date_data else None
+    return {"date": {"start": start}} if start else None
+
+
+def encode_unchecked(prop):
+    # New tasks always start as not done
+    return {"checkbox": False}
+
+
+ENCODERS = {
+    "checkbox": encode_checkbox,
+    "rich_text": encode_rich_text,
+    "url": encode_url,
+    "select": encode_select,
+    "date": encode_date
+}
+
+
+def compile_codec_plan(schema):
+    """
+    Compile a schema (property name -> type) into a tuple of (property name, encoder) pairs
+
+    The plan is built once per schema and reused for every template and occurrence,
+    so no property types are compared while extracting or creating tasks.
+    """
+    plan = []
+    for prop_name, prop_type in schema.items():
+        if prop_name in RESERVED_PROPERTIES:
+            continue
+
+        if prop_name == "Done" and prop_type == "checkbox":
+            plan.append((prop_name, encode_unchecked))
+            continue
+
+        encoder = ENCODERS.get(prop_type)
+        if encoder:
+            plan.append((prop_name, encoder))
+
+    logger.debug(f"Compiled codec plan for {len(plan)} of {len(schema)} properties")
+    return tuple(plan)
+
+
+def encode_properties(codec_plan, properties):
+    """
+    Run a codec plan over a template's properties, returning (property name, value) pairs
+    """
+    encoded = []
+    for prop_name, encoder in codec_plan:
+        value = encoder(properties.get(prop_name))
+        if value is not None:
+            encoded.append((prop_name, value))
+    return tuple(encoded)
+
+
+def compile_payload_template(build_payload):
+    """
+    Serialize a create payload once, leaving a slot for the ISO due date
+
+    build_payload is called with a placeholder in place of the date string. The
+    result is a (prefix, suffix) pair of bytes around that placeholder.
+    """
+    placeholder = f"due-date-{uuid.uuid4().hex}"
+    body = json.dumps(build_payload(placeholder), separators=(",", ":")).encode("utf-8")
+    prefix, suffix = body.split(placeholder.encode("ascii"), 1)
+    return prefix, suffix
+
+
+def render_payload(payload_template, due_date):
+    """
+    Request body for one occurrence: the template with the due date spliced in
+    """
+    prefix, suffix = payload_template
+    return b"".join((prefix, due_date.isoformat().encode("ascii"), suffix))
@@ -0,0 +1,131 @@
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger('day_capacity')
+
+
+def existing_loads(start_date, days, existing_tasks_by_date):
+    """
+    Existing task counts for each of `days` days from start_date, from counts keyed by ISO date
+    """
+    return [
+        existing_tasks_by_date.get((start_date + timedelta(days=offset)).strftime("%Y-%m-%d"), 0)
+        for offset in range(days)
+    ]
+
+
+class DayCapacityIndex:
+    """
+    Task counts per day over a planning window with fast next-free-day lookups
+
+    Days are integer offsets from start_date. Each regularity lattice (step and
+    first offset modulo step) gets a union-find forest over its days in which
+    every full day points at the next day of the lattice, so finding the first
+    day >= d with a free slot skips runs of full days in near-constant
+    amortized time instead of stepping through them one by one. Slots are only
+    ever taken, so a day linked as full stays full.
+    """
+
+    def __init__(self, start_date, end_date, capacity, existing_tasks_by_date):
+        self.start_date = start_date
+        self.days = (end_date - start_date).days + 1
+        self.capacity = capacity
+        self.loads = existing_loads(start_date, self.days, existing_tasks_by_date)
+        # (step, residue) -> parent pointers over the lattice positions plus an end sentinel
+        self.lattices = {}
+
+    def offset(self, day):
+        return (day - self.start_date).days
+
+    def load(self, day):
+        """
+        Existing plus reserved tasks on a date
+        """
+        return self.loads[self.offset(day)]
+
+    def _find(self, parent, step, residue, position):
+        # Follow the pointers to a root, linking full days to their successor as they are found
+        root = position
+        while True:
+            while parent[root] != root:
+                root = parent[root]
+            if root == len(parent) - 1 or self.loads[residue + root * step] < self.capacity:
+                break
+            parent[root] = root + 1
+
+        # Path compression
+        while parent[position] != root:
+            parent[position], position = root, parent[position]
+        return root
+
+    def next_free(self, day, step):
+        """
+        First date >= day on the lattice day + k * step with a free slot, or None
+        """
+        offset = self.offset(day)
+        if offset < 0 or offset >= self.days:
+            return None
+
+        residue = offset % step
+        parent = self.lattices.get((step, residue))
+        if parent is None:
+            parent = list(range(len(range(residue, self.days, step)) + 1))
+            self.lattices[(step, residue)] = parent
+
+        position = self._find(parent, step, residue, offset // step)
+        if position == len(parent) - 1:
+            return None
+        return self.start_date + timedelta(days=residue + position * step)
+
+    def reserve(self, day):
+        """
+        Take one slot on a date
+        """
+        self.loads[self.offset(day)] += 1
+
+
+class DayLoadTree:
+    """
+    Segment tree over day offsets answering "least loaded day in [first, last]" in O(log n)
+
+    Ties go to the earliest day.
+    """
+
+    def __init__(self, loads):
+        self.size = 1
+        while self.size < len(loads):
+            self.size *= 2
+        self.tree = [(float("inf"), offset) for offset in range(2 * self.size)]
+        for offset, load in enumerate(loads):
+            self.tree[self.size + offset] = (load, offset)
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def load(self, offset):
+        return self.tree[self.size + offset][0]
+
+    def add(self, offset, delta):
+        node = self.size + offset
+        self.tree[node] = (self.tree[node][0] + delta, offset)
+        node //= 2
+        while node:
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def min_load(self, first, last):
+        """
+        (load, offset) of the least loaded day between two inclusive offsets
+        """
+        best = (float("inf"), first)
+        low = self.size + first
+        high = self.size + last + 1
+        while low < high:
+            if low & 1:
+                best = min(best, self.tree[low])
+                low += 1
+            if high & 1:
+                high -= 1
+                best = min(best, self.tree[high])
+            low //= 2
+            high //= 2
+        return best
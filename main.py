@@ -1,12 +1,25 @@
 import os
+import atexit
+import argparse
+import asyncio
 import logging
 import json
 import math
+import threading
+import uuid
 from datetime import datetime, date, timedelta
 from collections import defaultdict
-import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from codec import ENCODERS, TemplateCache, TemplateTask, compile_codec_plan, compile_payload_template, encode_properties, render_payload
+from cassette import RECORD, Cassette, scratch_cache_dir
+from notion_client import NotionClient, NotionAPIError, RateLimiter, RetryPolicy, prefetch
+from mirror import NotionMirror, open_mirror
+from occupancy_index import OccupancyIndex, occupancy_index_path
+from outbox import Outbox
+from planner import count_planned_by_date, plan_schedule
+from run_fingerprint import load_run_fingerprint, save_run_fingerprint
+from schema_cache import load_schema_cache, save_schema_cache, is_fresh
 
 # Configure logging 
 logging.basicConfig(
@@ -28,6 +41,36 @@ DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
 
 # Configuration
 MAX_TASKS_PER_DAY = 3  # Maximum number of Quick wins allowed per day
+HTTP_POOL_SIZE = int(os.getenv("NOTION_POOL_SIZE", "10"))  # Keep-alive connections to the Notion API
+RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))  # Average API requests per second
+RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))  # Requests allowed back-to-back after idling
+READ_RETRIES = int(os.getenv("NOTION_READ_RETRIES", "5"))  # Retries per idempotent API call
+WRITE_RETRIES = int(os.getenv("NOTION_WRITE_RETRIES", "2"))  # Retries per page creation
+RUN_RETRIES = int(os.getenv("NOTION_RUN_RETRIES", "50"))  # Retries allowed for the whole run
+QUERY_PAGE_SIZE = 100  # Results per database query page (Notion maximum)
+EXISTING_TASK_SHARDS = int(os.getenv("NOTION_EXISTING_SHARDS", "4"))  # Date-range shards scanned concurrently
+CACHE_DIR = os.getenv("NOTION_CACHE_DIR", ".cache")  # Directory for on-disk caches
+SCHEMA_CACHE_TTL = int(os.getenv("NOTION_SCHEMA_CACHE_TTL", "3600"))  # Seconds a cached schema is used without revalidation
+OCCUPANCY_INDEX_TTL = int(os.getenv("NOTION_OCCUPANCY_INDEX_TTL", "21600"))  # Seconds before the day index is reconciled by a scan even without outside edits
+TEMPLATE_CACHE_SIZE = int(os.getenv("NOTION_TEMPLATE_CACHE_SIZE", "1024"))  # Extracted templates kept in memory
+OUTBOX_PATH = os.getenv("NOTION_OUTBOX_PATH", os.path.join(CACHE_DIR, "outbox.jsonl"))  # Queue of offline-planned creates
+CASSETTE_PATH = os.getenv("NOTION_CASSETTE_PATH", "")  # Record/replay file for API traffic; empty disables it
+CASSETTE_MODE = os.getenv("NOTION_CASSETTE_MODE", "replay")  # "record" or "replay"
+CASSETTE_LATENCY = os.getenv("NOTION_CASSETTE_LATENCY", "original")  # Replay with "original" or "zero" latency
+MIRROR_PATH = os.getenv("NOTION_MIRROR_PATH", "")  # SQLite mirror of the database; empty disables it
+MIRROR_FULL_SYNC_INTERVAL = int(os.getenv("NOTION_MIRROR_FULL_SYNC_INTERVAL", "86400"))  # Seconds between full syncs
+TODAY = os.getenv("NOTION_TODAY", "")  # ISO date to schedule from instead of today; replays default to the recorded day
+WEIGHT_PROPERTY = os.getenv("NOTION_WEIGHT_PROPERTY", "Weight")  # Number property giving a template's share of full days
+LEVEL_DAYS = int(os.getenv("NOTION_LEVEL_DAYS", "0"))  # Days an occurrence may move to flatten daily load; 0 keeps the regular dates
+PLANNER_BACKEND = os.getenv("NOTION_PLANNER_BACKEND", "heap")  # "heap", or "numpy" for very large template sets
+ASYNC_CONCURRENCY = int(os.getenv("NOTION_CONCURRENCY", "10"))  # Concurrent task creations in async mode
+
+# Cassette runs keep their local state in a throwaway directory, away from the real caches
+if CASSETTE_PATH:
+    CACHE_DIR = scratch_cache_dir()
+    OUTBOX_PATH = os.path.join(CACHE_DIR, "outbox.jsonl")
+    if MIRROR_PATH:
+        MIRROR_PATH = os.path.join(CACHE_DIR, "mirror.db")
 
 # Log configuration details
 logger.info(f"Starting Notion Task Duplicator")
@@ -38,45 +81,158 @@ if not NOTION_API_TOKEN:
 if not DATABASE_ID:
     logger.error("NOTION_DATABASE_ID not found in environment variables")
 
-# Notion API headers
-headers = {
-    "Authorization": f"Bearer {NOTION_API_TOKEN}",
-    "Content-Type": "application/json",
-    "Notion-Version": "2022-06-28"
-}
+# Database property definitions, fetched once and shared by the schema and the queries
+database_properties = {}
+database_properties_lock = threading.Lock()
 
-def get_database_schema():
+# Extracted templates keyed by page id and last_edited_time, reused while unchanged
+template_cache = TemplateCache(maxsize=TEMPLATE_CACHE_SIZE)
+
+# Create payloads planned offline, waiting to be flushed
+outbox = Outbox(OUTBOX_PATH)
+
+# Persistent per-day task counts, updated by every create
+occupancy_index = OccupancyIndex(occupancy_index_path(CACHE_DIR, DATABASE_ID))
+
+# Local SQLite mirror, opened and synced on first use
+mirror = None
+mirror_lock = threading.Lock()
+
+# Optional cassette recording or replaying every API call
+cassette = None
+if CASSETTE_PATH:
+    cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, original_latency=CASSETTE_LATENCY != "zero")
+    if CASSETTE_MODE == RECORD:
+        # Request bodies carry dates, so a replay has to schedule from the recorded day
+        cassette.meta["today"] = TODAY or date.today().isoformat()
+        atexit.register(cassette.save)
+
+# Shared Notion API client with pooled keep-alive connections
+client = NotionClient(
+    NOTION_API_TOKEN,
+    pool_size=HTTP_POOL_SIZE,
+    rate_limiter=RateLimiter(rate=RATE_LIMIT, burst=RATE_BURST),
+    retry_policy=RetryPolicy(read_retries=READ_RETRIES, write_retries=WRITE_RETRIES, run_retries=RUN_RETRIES),
+    cassette=cassette
+)
+
+def get_mirror():
     """
-    Get the schema of the database to understand property types
+    Open the local mirror and sync it once per run, or return None when it is disabled or unavailable
     """
-    url = f"https://api.notion.com/v1/databases/{DATABASE_ID}"
+    global mirror
     
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            logger.error(f"Error fetching database schema: {response.status_code}")
-            logger.error(response.text)
-            return {}
-            
-        data = response.json()
-        properties = data.get('properties', {})
+    if not MIRROR_PATH:
+        return None
+    
+    with mirror_lock:
+        if mirror is None:
+            mirror = open_mirror(MIRROR_PATH, client, DATABASE_ID, MIRROR_FULL_SYNC_INTERVAL) or False
+        return mirror or None
+
+def get_database_properties():
+    """
+    Fetch the database's property definitions once per run and share them between callers
+    """
+    with database_properties_lock:
+        if database_properties:
+            return database_properties
+        
+        # Reuse the on-disk schema while it is within its TTL
+        cached = load_schema_cache(CACHE_DIR, DATABASE_ID)
+        if is_fresh(cached, SCHEMA_CACHE_TTL):
+            logger.info(f"Using cached database schema (last edited {cached['last_edited_time']})")
+            database_properties.update(cached["properties"])
+            return database_properties
+        
+        url = f"https://api.notion.com/v1/databases/{DATABASE_ID}"
         
-        # Create a mapping of property name to type
-        schema = {}
-        for name, details in properties.items():
-            prop_type = details.get('type')
-            schema[name] = prop_type
+        try:
+            response = client.get(url)
+            if response.status_code != 200:
+                logger.error(f"Error fetching database schema: {response.status_code}")
+                logger.error(response.text)
+                return {}
             
+            data = response.json()
+            last_edited_time = data.get("last_edited_time")
+            if cached and cached.get("last_edited_time") == last_edited_time:
+                logger.info(f"Database schema unchanged since {last_edited_time}, revalidated cache")
+            
+            database_properties.update(data.get('properties', {}))
+            save_schema_cache(CACHE_DIR, DATABASE_ID, last_edited_time, database_properties)
+            return database_properties
+        except Exception as e:
+            logger.exception(f"Error getting database schema: {str(e)}")
+            return {}
+
+def get_database_schema():
+    """
+    Get the schema of the database to understand property types
+    """
+    properties = get_database_properties()
+    
+    # Create a mapping of property name to type
+    schema = {}
+    for name, details in properties.items():
+        prop_type = details.get('type')
+        schema[name] = prop_type
+    
+    if schema:
         logger.info(f"Database schema retrieved with {len(schema)} properties")
         logger.debug(f"Schema: {json.dumps(schema)}")
-        return schema
-    except Exception as e:
-        logger.exception(f"Error getting database schema: {str(e)}")
-        return {}
+    return schema
 
-def get_templated_tasks():
+def get_known_properties():
+    """
+    Property definitions available without a request: this run's or the fresh on-disk schema, else {}
+    
+    The bootstrap queries use this instead of get_database_properties so they never
+    wait behind the schema GET that runs next to them.
+    """
+    if database_properties:
+        return dict(database_properties)
+    
+    cached = load_schema_cache(CACHE_DIR, DATABASE_ID)
+    if is_fresh(cached, SCHEMA_CACHE_TTL):
+        return cached["properties"]
+    return {}
+
+def get_property_ids(names, properties):
+    """
+    Map property names to the IDs Notion expects in filter_properties
+    
+    Returns None (no projection) if the schema is not known yet or a name is unknown.
+    """
+    if not properties:
+        logger.debug("Database schema not loaded yet, fetching all properties")
+        return None
+    
+    property_ids = []
+    for name in names:
+        prop_id = properties.get(name, {}).get("id")
+        if not prop_id:
+            logger.warning(f"Property '{name}' not found in schema, fetching all properties")
+            return None
+        property_ids.append(prop_id)
+    return property_ids
+
+def get_template_property_names(properties):
+    """
+    Names of the properties extract_task_properties reads from a template
     """
-    Fetch Quick wins with empty dates from the Notion database
+    names = ["Task", "Regularity (days)"]
+    for name, details in properties.items():
+        if name not in names and (details.get("type") in ENCODERS or name == WEIGHT_PROPERTY):
+            names.append(name)
+    return names
+
+def iter_templated_tasks():
+    """
+    Stream Quick wins with empty dates from the Notion database, walking every result page
+    
+    A failed page is logged and re-raised, so callers never mistake a partial
+    stream for the complete list of templates.
     """
     url = f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
     
@@ -100,26 +256,66 @@ def get_templated_tasks():
         }
     }
     
+    # Answer from the local mirror when it is enabled
+    local_mirror = get_mirror()
+    if local_mirror:
+        results = local_mirror.pages_without_date("Quick win")
+        logger.info(f"Successfully fetched {len(results)} Quick wins from the mirror")
+        yield from results
+        return
+    
     logger.info(f"Fetching Quick wins from database: {DATABASE_ID}")
     
+    fetched = 0
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        data = response.json()
-        
-        if response.status_code != 200:
-            logger.error(f"Error fetching tasks: {data}")
-            return []
-        
-        results = data.get("results", [])
-        logger.info(f"Successfully fetched {len(results)} Quick wins")
-        return results
+        # Yield each page's templates as soon as it arrives
+        # Only download the properties that are copied to new tasks
+        properties = get_known_properties()
+        filter_properties = get_property_ids(get_template_property_names(properties), properties)
+        for results in client.query_pages(url, payload, page_size=QUERY_PAGE_SIZE, filter_properties=filter_properties):
+            fetched += len(results)
+            logger.info(f"Fetched a page of {len(results)} Quick wins ({fetched} so far)")
+            yield from results
+    except NotionAPIError as e:
+        logger.error(f"Error fetching tasks after {fetched} Quick wins: {e.body}")
+        raise
     except Exception as e:
-        logger.exception(f"Exception when fetching tasks: {str(e)}")
+        logger.exception(f"Exception when fetching tasks after {fetched} Quick wins: {str(e)}")
+        raise
+    
+    logger.info(f"Successfully fetched {fetched} Quick wins")
+
+def get_templated_tasks():
+    """
+    Fetch all Quick wins with empty dates from the Notion database, or [] if any page fails
+    """
+    try:
+        return list(iter_templated_tasks())
+    except Exception:
         return []
 
-def get_existing_tasks(start_date, end_date):
+def split_date_range(start_date, end_date, shards):
     """
-    Fetch existing tasks in the date range to avoid exceeding daily limits
+    Split an inclusive date range into at most `shards` contiguous inclusive sub-ranges
+    """
+    total_days = (end_date - start_date).days + 1
+    shards = max(1, min(shards, total_days))
+    
+    ranges = []
+    shard_start = start_date
+    for index in range(shards):
+        # Spread the remainder over the first shards so sizes differ by at most one day
+        shard_days = total_days // shards + (1 if index < total_days % shards else 0)
+        shard_end = shard_start + timedelta(days=shard_days - 1)
+        ranges.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return ranges
+
+def count_tasks_by_date(start_date, end_date):
+    """
+    Count tasks per date in one inclusive date range, walking every result page
+    
+    Raises NotionAPIError if a page cannot be fetched.
     """
     url = f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
     
@@ -147,20 +343,16 @@ def get_existing_tasks(start_date, end_date):
         }
     }
     
-    logger.info(f"Fetching existing tasks from {start_date_str} to {end_date_str}")
+    logger.debug(f"Fetching existing tasks shard from {start_date_str} to {end_date_str}")
     
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        data = response.json()
-        
-        if response.status_code != 200:
-            logger.error(f"Error fetching existing tasks: {data}")
-            return {}
-        
-        results = data.get("results", [])
-        
-        # Count tasks by date
-        tasks_by_date = defaultdict(int)
+    # Count tasks by date
+    tasks_by_date = defaultdict(int)
+    
+    # Only the Date property is needed for counting
+    filter_properties = get_property_ids(["Date"], get_known_properties())
+    
+    # The next page is requested in the background while the current one is counted
+    for results in prefetch(client.query_pages(url, payload, page_size=QUERY_PAGE_SIZE, filter_properties=filter_properties)):
         for task in results:
             try:
                 date_prop = task.get("properties", {}).get("Date", {}).get("date", {})
@@ -169,21 +361,125 @@ def get_existing_tasks(start_date, end_date):
                     tasks_by_date[task_date] += 1
             except Exception as e:
                 logger.warning(f"Error processing task date: {str(e)}")
+    
+    return tasks_by_date
+
+def get_edited_pages(since):
+    """
+    last_edited_time by page id of the pages edited at or after an ISO timestamp, or of all pages when since is None
+    
+    Returns None if the query fails or fills a whole result page, as the pages may then be incomplete.
+    """
+    url = f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
+    
+    payload = {
+        "sorts": [
+            {
+                "timestamp": "last_edited_time",
+                "direction": "descending"
+            }
+        ]
+    }
+    if since:
+        payload["filter"] = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {
+                "on_or_after": since
+            }
+        }
+    
+    try:
+        results = next(client.query_pages(url, payload, page_size=QUERY_PAGE_SIZE, filter_properties=["title"]), [])
+        if len(results) >= QUERY_PAGE_SIZE:
+            return None
+        return {result.get("id"): result.get("last_edited_time") for result in results}
+    except Exception as e:
+        logger.warning(f"Could not fetch recently edited pages: {str(e)}")
+        return None
+
+def get_existing_tasks(start_date, end_date, shards=EXISTING_TASK_SHARDS, latest_edit=None):
+    """
+    Fetch existing tasks in the date range to avoid exceeding daily limits
+    
+    The occupancy index answers with a single request when it covers the range and
+    no page was edited since it was reconciled other than by the creates and
+    archives of these scripts. Otherwise the range is split into date shards that
+    are paginated concurrently, with all requests going through the shared rate
+    limiter, and the index is reconciled. latest_edit is the result of get_latest_edit for this run;
+    without it the index is neither used nor made usable.
+    
+    Returns None if the scan fails, since empty counts would overbook every day.
+    """
+    start_date_str = start_date.strftime("%Y-%m-%d")
+    end_date_str = end_date.strftime("%Y-%m-%d")
+    date_ranges = split_date_range(start_date, end_date, shards)
+    
+    # Answer from the occupancy index unless someone else edited the database since it was reconciled
+    if latest_edit is not None and occupancy_index.covers(start_date_str, end_date_str, OCCUPANCY_INDEX_TTL):
+        if occupancy_index.accounts_for(get_edited_pages(occupancy_index.edit_cursor)):
+            tasks_by_date = occupancy_index.get_counts(start_date_str, end_date_str)
+            logger.info(f"Found {sum(tasks_by_date.values())} existing tasks in date range (occupancy index)")
+            logger.info(f"Tasks by date: {dict(tasks_by_date)}")
+            return tasks_by_date
+        logger.info("Database edited since the occupancy index was reconciled, scanning existing tasks")
+    
+    # Edits read before the scan are reflected in it, so the reconciled index accounts for them
+    edit_cursor = None
+    edited_pages = None
+    if latest_edit is not None:
+        edit_cursor = latest_edit.get("last_edited_time")
+        edited_pages = get_edited_pages(edit_cursor)
+    
+    # Answer from the local mirror when it is enabled
+    local_mirror = get_mirror()
+    if local_mirror:
+        tasks_by_date = local_mirror.count_tasks_by_date(start_date_str, end_date_str)
+        occupancy_index.reconcile(start_date_str, end_date_str, tasks_by_date, edit_cursor, edited_pages)
+        logger.info(f"Found {sum(tasks_by_date.values())} existing tasks in date range (mirror)")
+        logger.info(f"Tasks by date: {dict(tasks_by_date)}")
+        return tasks_by_date
+    
+    logger.info(f"Fetching existing tasks from {start_date_str} to {end_date_str} in {len(date_ranges)} shards")
+    
+    try:
+        # Merge the per-shard counts
+        tasks_by_date = defaultdict(int)
+        
+        with ThreadPoolExecutor(max_workers=len(date_ranges), thread_name_prefix="existing_tasks") as executor:
+            for shard_counts in executor.map(lambda date_range: count_tasks_by_date(*date_range), date_ranges):
+                for task_date, count in shard_counts.items():
+                    tasks_by_date[task_date] += count
         
-        logger.info(f"Found {len(results)} existing tasks in date range")
+        # The scan is authoritative for the range, so it resets the occupancy index there
+        occupancy_index.reconcile(start_date_str, end_date_str, tasks_by_date, edit_cursor, edited_pages)
+        
+        logger.info(f"Found {sum(tasks_by_date.values())} existing tasks in date range")
         logger.info(f"Tasks by date: {dict(tasks_by_date)}")
         return tasks_by_date
         
+    except NotionAPIError as e:
+        logger.error(f"Error fetching existing tasks: {e.body}")
+        return None
     except Exception as e:
         logger.exception(f"Exception when fetching existing tasks: {str(e)}")
-        return {}
+        return None
 
-def extract_task_properties(task, schema):
+def extract_task_properties(task, codec_plan):
     """
-    Extract relevant properties from a Notion task
+    Extract relevant properties from a Notion task into a TemplateTask using the compiled codec plan
     """
     try:
         task_id = task.get("id", "unknown_id")
+        
+        # Unchanged templates are served from the cache without being parsed again
+        cache_key = None
+        if task.get("last_edited_time"):
+            cache_key = (task_id, task["last_edited_time"], codec_plan)
+            template = template_cache.get(cache_key)
+            if template is not None:
+                logger.debug(f"Using cached template: {template.name} ({task_id})")
+                return template
+        
         logger.info(f"Extracting properties for task: {task_id}")
         
         properties = task.get("properties", {})
@@ -199,54 +495,33 @@ def extract_task_properties(task, schema):
         regularity_days = properties.get("Regularity (days)", {}).get("number", 1) or 1
         logger.debug(f"Extracted regularity_days: {regularity_days}")
         
-        # Create a property map to store all properties with correct types
-        property_map = {
-            "name": name,
-            "regularity_days": regularity_days
-        }
+        # Extract the fair-share weight (number), defaulting to an equal share
+        weight = (properties.get(WEIGHT_PROPERTY) or {}).get("number") or 1
+        if weight < 0:
+            weight = 1
+        logger.debug(f"Extracted weight: {weight}")
         
-        # Extract all properties based on their type in the schema
-        for prop_name, prop_details in properties.items():
-            prop_type = schema.get(prop_name, "unknown")
-            
-            # Skip properties we've already processed
-            if prop_name in ["Task", "Regularity (days)"]:
-                continue
-                
-            # Extract based on property type
-            if prop_type == "checkbox":
-                property_map[f"{prop_name}_checkbox"] = prop_details.get("checkbox", False)
-            elif prop_type == "rich_text":
-                property_map[f"{prop_name}_rich_text"] = prop_details.get("rich_text", [])
-            elif prop_type == "url":
-                property_map[f"{prop_name}_url"] = prop_details.get("url")
-            elif prop_type == "select":
-                select_data = prop_details.get("select", {})
-                if select_data:
-                    property_map[f"{prop_name}_select"] = select_data.get("name")
-            elif prop_type == "date":
-                date_data = prop_details.get("date", {})
-                if date_data:
-                    property_map[f"{prop_name}_date"] = date_data.get("start")
+        # Keep the encoded values of all copied properties in schema order
+        template = TemplateTask(task_id, name, regularity_days, encode_properties(codec_plan, properties), weight=weight)
+        
+        # Serialize the create payload once for all occurrences of this template
+        template.payload_template = get_payload_template(template)
+        
+        if cache_key:
+            template_cache.put(cache_key, template)
         
         logger.info(f"Successfully extracted properties for task: {name} (regularity: {regularity_days})")
-        return property_map
+        return template
         
     except Exception as e:
         logger.exception(f"Error extracting task properties: {str(e)}")
-        return {
-            "name": "Error extracting task",
-            "regularity_days": 1
-        }
+        return TemplateTask(task.get("id", "unknown_id"), "Error extracting task", 1)
 
-def create_task(properties, due_date, schema):
+def build_task_data(template, due_date_str):
     """
-    Create a new task in Notion based on template properties and due date
+    Build the page creation payload for one occurrence of a template
     """
-    url = "https://api.notion.com/v1/pages"
-    
-    task_name = properties.get("name", "Unnamed task")
-    logger.info(f"Creating new task: '{task_name}' for date: {due_date.strftime('%Y-%m-%d')}")
+    task_name = template.name
     
     # Prepare task properties
     new_properties = {
@@ -266,41 +541,14 @@ def create_task(properties, due_date, schema):
         },
         "Date": {
             "date": {
-                "start": due_date.strftime("%Y-%m-%d")
+                "start": due_date_str
             }
         }
     }
     
-    # Add all properties based on their type in the schema
-    for prop_name, prop_type in schema.items():
-        # Skip properties we've already set
-        if prop_name in ["Task", "Task Type", "Date"]:
-            continue
-            
-        # Set property based on its type
-        if prop_type == "checkbox":
-            new_properties[prop_name] = {
-                "checkbox": properties.get(f"{prop_name}_checkbox", False)
-            }
-        elif prop_type == "rich_text":
-            rich_text_value = properties.get(f"{prop_name}_rich_text", [])
-            new_properties[prop_name] = {"rich_text": rich_text_value}
-        elif prop_type == "url":
-            url_value = properties.get(f"{prop_name}_url")
-            # Important fix: For URL fields, use null instead of empty string
-            new_properties[prop_name] = {"url": url_value if url_value else None}
-        elif prop_type == "select":
-            select_value = properties.get(f"{prop_name}_select")
-            if select_value:
-                new_properties[prop_name] = {"select": {"name": select_value}}
-        elif prop_type == "date":
-            date_value = properties.get(f"{prop_name}_date")
-            if date_value:
-                new_properties[prop_name] = {"date": {"start": date_value}}
-    
-    # Special case: Always set Done to false for new tasks
-    if "Done" in schema and schema["Done"] == "checkbox":
-        new_properties["Done"] = {"checkbox": False}
+    # Add the template's encoded properties (including Done reset to false)
+    for prop_name, value in template.properties:
+        new_properties[prop_name] = value
     
     task_data = {
         "parent": {"database_id": DATABASE_ID},
@@ -309,116 +557,477 @@ def create_task(properties, due_date, schema):
     
     # Debug log the full properties being sent
     logger.debug(f"Full properties for task creation: {json.dumps(new_properties)}")
+    return task_data
+
+def get_payload_template(template):
+    """
+    Serialized create payload of a template with a slot for the due date
+    """
+    if template.payload_template is None:
+        return compile_payload_template(lambda due_date_str: build_task_data(template, due_date_str))
+    return template.payload_template
+
+def check_create_response(response, task_name, due_date_str):
+    """
+    Return the page created by a page-creation response, or None if Notion rejected it
+    """
+    data = response.json()
+    
+    if response.status_code not in [200, 201]:
+        logger.error(f"Error creating task: {task_name}")
+        logger.error(f"API response: {data}")
+        return None
+    
+    new_task_id = data.get("id", "unknown")
+    logger.info(f"Successfully created task: '{task_name}' (ID: {new_task_id}, date: {due_date_str})")
+    return data
+
+def record_created_task(data, due_date_str):
+    """
+    Apply a created page to the occupancy index and the mirror without waiting for the next scan
+    """
+    occupancy_index.add(due_date_str, 1, data.get("id"), data.get("last_edited_time"))
+    local_mirror = get_mirror()
+    if local_mirror:
+        local_mirror.upsert_pages([data])
+
+def create_task(template, due_date):
+    """
+    Create a new task in Notion based on a template and due date
+    """
+    url = "https://api.notion.com/v1/pages"
+    
+    task_name = template.name
+    due_date_str = due_date.strftime("%Y-%m-%d")
+    logger.info(f"Creating new task: '{task_name}' for date: {due_date_str}")
+    
+    # Only the date differs between occurrences, so splice it into the pre-serialized payload
+    body = render_payload(get_payload_template(template), due_date)
     
     try:
-        response = requests.post(url, headers=headers, json=task_data)
-        data = response.json()
-        
-        if response.status_code not in [200, 201]:
-            logger.error(f"Error creating task: {task_name}")
-            logger.error(f"API response: {data}")
-            return None
+        data = check_create_response(client.post(url, data=body), task_name, due_date_str)
+        if data:
+            record_created_task(data, due_date_str)
+        return data
         
-        new_task_id = data.get("id", "unknown")
-        logger.info(f"Successfully created task: '{task_name}' (ID: {new_task_id}, date: {due_date.strftime('%Y-%m-%d')})")
+    except Exception as e:
+        logger.exception(f"Exception when creating task '{task_name}': {str(e)}")
+        return None
+
+async def async_create_task(async_client, template, due_date):
+    """
+    Create a new task in Notion through the async client
+    """
+    url = "https://api.notion.com/v1/pages"
+    
+    task_name = template.name
+    due_date_str = due_date.strftime("%Y-%m-%d")
+    logger.info(f"Creating new task: '{task_name}' for date: {due_date_str}")
+    
+    # Only the date differs between occurrences, so splice it into the pre-serialized payload
+    body = render_payload(get_payload_template(template), due_date)
+    
+    try:
+        data = check_create_response(await async_client.post(url, data=body), task_name, due_date_str)
+        if data:
+            # The index and mirror writes block on disk, so keep them off the event loop
+            await asyncio.to_thread(record_created_task, data, due_date_str)
         return data
         
     except Exception as e:
         logger.exception(f"Exception when creating task '{task_name}': {str(e)}")
         return None
 
-def schedule_tasks():
+def get_today():
     """
-    Main function to schedule tasks based on templates
+    The day scheduling starts: NOTION_TODAY, the day a replayed cassette was recorded, or today
+    """
+    if TODAY:
+        return date.fromisoformat(TODAY)
+    if cassette is not None and cassette.meta.get("today"):
+        return date.fromisoformat(cassette.meta["today"])
+    return date.today()
+
+def get_scheduling_window():
+    """
+    Return the first and last day to schedule: today until the end of the current month
     """
-    # Get current date and month details
-    today = date.today()
+    today = get_today()
     current_month = today.month
     current_year = today.year
     last_day_of_month = datetime(current_year, current_month, 1).replace(day=28) + timedelta(days=4)
     end_of_month = (last_day_of_month.replace(day=1) - timedelta(days=1)).date()
+    return today, end_of_month
+
+def fetch_scheduling_inputs(start_date, end_date, latest_edit=None):
+    """
+    Fetch the database schema, existing task counts and templates concurrently
     
-    logger.info(f"Scheduling tasks from {today} to {end_of_month}")
-    
-    # First get the database schema to know property types
-    schema = get_database_schema()
-    if not schema:
-        logger.error("Failed to retrieve database schema. Cannot continue.")
-        return []
-    
-    # Get existing tasks to check daily limits
-    existing_tasks_by_date = get_existing_tasks(today, end_of_month)
-    
-    # Track tasks we'll create to update our daily counts
-    new_tasks_by_date = defaultdict(int)
-    
-    # Get all template tasks
-    template_tasks = get_templated_tasks()
-    if not template_tasks:
-        logger.warning("No Quick wins found. Nothing to schedule.")
-        return []
-    
-    logger.info(f"Found {len(template_tasks)} Quick wins")
+    The three reads are independent, so startup latency is that of the slowest one.
+    Templates are returned as a stream that keeps fetching later pages in the
+    background while the caller processes the first ones. The schema getter
+    returns {} and the counts getter None on failure; the template stream raises.
+    """
+    template_tasks = prefetch(iter_templated_tasks(), buffer_size=QUERY_PAGE_SIZE)
     
-    created_tasks = []
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="bootstrap") as executor:
+        schema_future = executor.submit(get_database_schema)
+        existing_future = executor.submit(get_existing_tasks, start_date, end_date, latest_edit=latest_edit)
+        
+        return schema_future.result(), existing_future.result(), template_tasks
+
+def extract_templates(template_tasks, codec_plan):
+    """
+    Extract every template page, leaving out those without a regularity
     
-    # Process each template task
+    Returns the templates and the number of pages read.
+    """
+    templates = []
+    index = -1
     for index, task in enumerate(template_tasks):
-        logger.info(f"Processing template {index+1}/{len(template_tasks)}")
+        logger.info(f"Processing template {index+1}")
         
         # Extract task properties
-        task_properties = extract_task_properties(task, schema)
-        task_name = task_properties.get("name", "Unnamed task")
+        template = extract_task_properties(task, codec_plan)
+        task_name = template.name
         
         # Get regularity in days
-        regularity = task_properties.get("regularity_days", 1)
+        regularity = template.regularity
         if not regularity:
             logger.info(f"Skipping task without regularity: {task_name}")
             continue
         
         logger.info(f"Processing template: {task_name} (every {regularity} days)")
-        
-        # Start from today and create tasks until end of month
-        current_date = today
-        
-        # Loop to create tasks with proper spacing based on regularity
-        task_count = 0
-        while current_date <= end_of_month:
-            # Get date string for checking counts
-            date_str = current_date.strftime("%Y-%m-%d")
-            
-            # Check if we've hit the daily limit
-            total_tasks_for_day = existing_tasks_by_date.get(date_str, 0) + new_tasks_by_date[date_str]
-            
-            if total_tasks_for_day >= MAX_TASKS_PER_DAY:
-                logger.info(f"Skipping task for {date_str} - daily limit of {MAX_TASKS_PER_DAY} reached")
-                # Move to next date based on regularity
-                current_date = current_date + timedelta(days=regularity)
-                continue
-            
-            # Create the task
-            logger.info(f"Creating task {task_count+1} for {task_name} on {current_date} (day has {total_tasks_for_day}/{MAX_TASKS_PER_DAY} tasks)")
-            result = create_task(task_properties, current_date, schema)
-            
-            if result:
-                created_tasks.append(result)
-                new_tasks_by_date[date_str] += 1
-                task_count += 1
-            
-            # IMPORTANT: Increment the date by the regularity value BEFORE next iteration
-            current_date = current_date + timedelta(days=regularity)
-            logger.info(f"Next task date for {task_name} would be {current_date}")
-            
-        # Add small delay between processing templates to avoid rate limiting
-        if index < len(template_tasks) - 1:
-            time.sleep(1)
+        templates.append(template)
+    
+    return templates, index + 1
+
+def get_latest_edit():
+    """
+    Id and last_edited_time of the most recently edited page, from a single one-result query
+    
+    Returns {} for an empty database and None if the query fails.
+    """
+    url = f"https://api.notion.com/v1/databases/{DATABASE_ID}/query"
+    
+    payload = {
+        "sorts": [
+            {
+                "timestamp": "last_edited_time",
+                "direction": "descending"
+            }
+        ]
+    }
+    
+    try:
+        results = next(client.query_pages(url, payload, page_size=1, filter_properties=["title"]), [])
+        if not results:
+            return {}
+        return {"id": results[0].get("id"), "last_edited_time": results[0].get("last_edited_time")}
+    except Exception as e:
+        logger.warning(f"Could not fetch the latest edit, running a full scheduling pass: {str(e)}")
+        return None
+
+def get_run_fingerprint(start_date, end_date):
+    """
+    Fingerprint of everything a scheduling run depends on, or None if it cannot be determined
+    """
+    latest_edit = get_latest_edit()
+    if latest_edit is None:
+        return None
+    
+    return {
+        "latest_edit": latest_edit,
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "max_tasks_per_day": MAX_TASKS_PER_DAY,
+        "level_days": LEVEL_DAYS,
+        "weight_property": WEIGHT_PROPERTY
+    }
+
+def record_run_fingerprint(start_date, end_date, fingerprint, created_tasks, complete):
+    """
+    Store the fingerprint of a run that created every task it planned
+    
+    When tasks were created the latest edit is fetched again; it is only stored if
+    it is one of our own pages, so edits made by others during the run are not hidden.
+    """
+    if not fingerprint or not complete:
+        return
+    
+    if created_tasks:
+        fingerprint = get_run_fingerprint(start_date, end_date)
+        created_ids = {task.get("id") for task in created_tasks}
+        if not fingerprint or fingerprint["latest_edit"].get("id") not in created_ids:
+            logger.info("Database changed during the run, not recording a run fingerprint")
+            return
+    
+    save_run_fingerprint(CACHE_DIR, DATABASE_ID, fingerprint)
+
+def plan_scheduling_run(today, end_of_month, force=False):
+    """
+    Everything a scheduling run does before its first write
+    
+    Checks the run fingerprint, reads the schema, the existing tasks and the
+    templates, and plans every occurrence. Returns (planned tasks, existing tasks
+    by date, fingerprint), or None when there is nothing to schedule or an input
+    could not be read.
+    """
+    # Exit early when nothing changed since the last successful run
+    fingerprint = get_run_fingerprint(today, end_of_month)
+    if not force and fingerprint and fingerprint == load_run_fingerprint(CACHE_DIR, DATABASE_ID):
+        logger.info("Nothing changed since the last successful run. Nothing to schedule.")
+        return None
+    
+    # Fetch the schema, the existing tasks and the templates concurrently
+    latest_edit = fingerprint["latest_edit"] if fingerprint else None
+    schema, existing_tasks_by_date, template_tasks = fetch_scheduling_inputs(today, end_of_month, latest_edit)
+    
+    # The schema is needed to know property types
+    if not schema:
+        logger.error("Failed to retrieve database schema. Cannot continue.")
+        return None
+    
+    # Compile the schema once into the per-property encoders used for every template
+    codec_plan = compile_codec_plan(schema)
+    
+    # Planning against missing counts would overbook days
+    if existing_tasks_by_date is None:
+        logger.error("Failed to retrieve existing tasks. Cannot continue.")
+        return None
+    
+    # Tasks queued offline but not flushed yet already occupy their days
+    existing_tasks_by_date = add_outbox_counts(existing_tasks_by_date)
+    
+    # A partial template list would be planned as if it were complete
+    try:
+        templates, template_count = extract_templates(template_tasks, codec_plan)
+    except Exception:
+        logger.error("Failed to retrieve all Quick wins. Nothing scheduled.")
+        return None
+    
+    if not template_count:
+        logger.warning("No Quick wins found. Nothing to schedule.")
+        return None
+    
+    # Plan every occurrence of every template before any request is sent
+    planned_tasks = plan_schedule(templates, today, end_of_month, existing_tasks_by_date, MAX_TASKS_PER_DAY, LEVEL_DAYS, PLANNER_BACKEND)
+    logger.info(f"Processed {template_count} Quick wins, creating {len(planned_tasks)} planned tasks")
+    
+    return planned_tasks, existing_tasks_by_date, fingerprint
+
+def finish_scheduling_run(today, end_of_month, fingerprint, planned_tasks, existing_tasks_by_date, results):
+    """
+    Log the outcome of a run's creates and record its fingerprint
+    
+    results holds the created page, or None, for each planned task in order.
+    """
+    # Track tasks we created to update our daily counts
+    new_tasks_by_date = count_planned_by_date(planned_tasks)
+    
+    created_tasks = []
+    failed_count = 0
+    for (template, due_date), result in zip(planned_tasks, results):
+        if result:
+            created_tasks.append(result)
+        else:
+            # Release the slot reserved while planning
+            new_tasks_by_date[due_date.strftime("%Y-%m-%d")] -= 1
+            failed_count += 1
     
     # Summary logging
     logger.info(f"Completed scheduling. {len(created_tasks)} tasks created for {today.month}/{today.year}")
     logger.info(f"Tasks per day after scheduling: {dict({**existing_tasks_by_date, **new_tasks_by_date})}")
+    logger.info(f"Template cache: {template_cache.hits} hits, {template_cache.misses} misses")
+    
+    record_run_fingerprint(today, end_of_month, fingerprint, created_tasks, complete=failed_count == 0)
     return created_tasks
 
-def main():
+def schedule_tasks(workers=0, force=False):
+    """
+    Main function to schedule tasks based on templates
+    
+    With workers > 0 the create calls are handed to a thread pool of that size
+    while planning stays sequential.
+    """
+    today, end_of_month = get_scheduling_window()
+    
+    logger.info(f"Scheduling tasks from {today} to {end_of_month}")
+    
+    run = plan_scheduling_run(today, end_of_month, force)
+    if run is None:
+        return []
+    planned_tasks, existing_tasks_by_date, fingerprint = run
+    
+    if workers > 0:
+        # Every worker needs its own keep-alive connection
+        client.ensure_pool_size(workers)
+        
+        # Slots are already reserved, so the POSTs can finish in any order
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="create_task") as executor:
+            results = list(executor.map(lambda planned_task: create_task(*planned_task), planned_tasks))
+    else:
+        results = [create_task(template, due_date) for template, due_date in planned_tasks]
+    
+    return finish_scheduling_run(today, end_of_month, fingerprint, planned_tasks, existing_tasks_by_date, results)
+
+async def async_schedule_tasks(concurrency=ASYNC_CONCURRENCY, force=False):
+    """
+    Asyncio variant of schedule_tasks that creates the tasks of all templates concurrently
+    """
+    # Imported here so the synchronous mode does not require aiohttp
+    from async_notion_client import AsyncNotionClient
+    
+    today, end_of_month = get_scheduling_window()
+    
+    logger.info(f"Scheduling tasks from {today} to {end_of_month} (async, concurrency: {concurrency})")
+    
+    # Planning blocks on the bootstrap reads, so it runs in a worker thread
+    run = await asyncio.to_thread(plan_scheduling_run, today, end_of_month, force)
+    if run is None:
+        return []
+    planned_tasks, existing_tasks_by_date, fingerprint = run
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with AsyncNotionClient(
+        NOTION_API_TOKEN,
+        pool_size=concurrency,
+        rate_limiter=client.rate_limiter,
+        retry_policy=client.retry_policy,
+        cassette=client.cassette
+    ) as async_client:
+        async def create(template, due_date):
+            async with semaphore:
+                return await async_create_task(async_client, template, due_date)
+        
+        results = await asyncio.gather(*(create(template, due_date) for template, due_date in planned_tasks))
+    
+    return await asyncio.to_thread(finish_scheduling_run, today, end_of_month, fingerprint, planned_tasks, existing_tasks_by_date, results)
+
+def add_outbox_counts(tasks_by_date):
+    """
+    Count tasks queued in the outbox but not yet created as occupying their days
+    
+    Entries dated before today are dropped by the next flush and occupy nothing.
+    """
+    tasks_by_date = defaultdict(int, tasks_by_date)
+    for date_str, count in outbox.pending_counts_by_date(since=get_today().isoformat()).items():
+        tasks_by_date[date_str] += count
+    return tasks_by_date
+
+def schedule_tasks_offline():
+    """
+    Plan tasks without network access and queue their create payloads in the outbox
+    
+    Templates and day counts come from the local mirror as of its last sync and
+    the schema from the schema cache. Run flush_outbox later to create the tasks.
+    """
+    today, end_of_month = get_scheduling_window()
+    
+    logger.info(f"Planning tasks offline from {today} to {end_of_month}")
+    
+    # The schema comes from the cache regardless of its age
+    cached = load_schema_cache(CACHE_DIR, DATABASE_ID)
+    if not cached:
+        logger.error("No cached database schema. Run online once before planning offline.")
+        return []
+    schema = {name: details.get("type") for name, details in cached["properties"].items()}
+    
+    if not MIRROR_PATH:
+        logger.error("Offline planning needs the local mirror (NOTION_MIRROR_PATH). Cannot continue.")
+        return []
+    
+    # Read the snapshot without syncing it
+    local_mirror = NotionMirror(MIRROR_PATH)
+    template_tasks = local_mirror.pages_without_date("Quick win")
+    if not template_tasks:
+        logger.warning("No Quick wins found in the mirror. Nothing to schedule.")
+        return []
+    
+    existing_tasks_by_date = add_outbox_counts(local_mirror.count_tasks_by_date(today.isoformat(), end_of_month.isoformat()))
+    
+    codec_plan = compile_codec_plan(schema)
+    
+    templates, _ = extract_templates(template_tasks, codec_plan)
+    
+    planned_tasks = plan_schedule(templates, today, end_of_month, existing_tasks_by_date, MAX_TASKS_PER_DAY, LEVEL_DAYS, PLANNER_BACKEND)
+    new_tasks_by_date = count_planned_by_date(planned_tasks)
+    
+    queued_tasks = []
+    for template, due_date in planned_tasks:
+        queued_tasks.append({
+            "id": str(uuid.uuid4()),
+            "template_id": template.id,
+            "name": template.name,
+            "date": due_date.isoformat(),
+            "body": render_payload(get_payload_template(template), due_date).decode("utf-8")
+        })
+    
+    outbox.append(queued_tasks)
+    
+    # Summary logging
+    logger.info(f"Completed offline planning. {len(queued_tasks)} tasks queued for {today.month}/{today.year}")
+    logger.info(f"Tasks per day after planning: {dict({**existing_tasks_by_date, **new_tasks_by_date})}")
+    return queued_tasks
+
+def send_outbox_entry(entry):
+    """
+    Create one queued task in Notion and mark it as sent
+    """
+    url = "https://api.notion.com/v1/pages"
+    
+    logger.info(f"Creating queued task: '{entry['name']}' for date: {entry['date']}")
+    
+    try:
+        data = check_create_response(client.post(url, data=entry["body"].encode("utf-8")), entry["name"], entry["date"])
+        if data:
+            # Mark it sent first so a failure below never sends it again
+            outbox.mark_sent(entry["id"])
+            record_created_task(data, entry["date"])
+        return data
+        
+    except Exception as e:
+        logger.exception(f"Exception when creating queued task '{entry['name']}': {str(e)}")
+        return None
+
+def flush_outbox(workers=0):
+    """
+    Create every queued task at the rate the client's limiter allows
+    
+    Failed entries stay in the outbox for the next flush. Entries dated before
+    today are dropped instead of creating tasks in the past.
+    """
+    entries = outbox.pending()
+    
+    today_str = get_today().isoformat()
+    past_entries = [entry for entry in entries if entry["date"] < today_str]
+    if past_entries:
+        for entry in past_entries:
+            logger.warning(f"Dropping queued task '{entry['name']}' for past date {entry['date']}")
+        outbox.drop(past_entries)
+        entries = [entry for entry in entries if entry["date"] >= today_str]
+    
+    logger.info(f"Flushing {len(entries)} queued tasks from {outbox.path}")
+    
+    if workers > 0:
+        # Every worker needs its own keep-alive connection
+        client.ensure_pool_size(workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flush_outbox") as executor:
+            results = list(executor.map(send_outbox_entry, entries))
+    else:
+        results = [send_outbox_entry(entry) for entry in entries]
+    
+    created_tasks = [result for result in results if result]
+    if len(created_tasks) < len(entries):
+        logger.warning(f"{len(entries) - len(created_tasks)} queued tasks could not be created and stay in the outbox")
+    else:
+        outbox.compact()
+    
+    logger.info(f"Completed flush. {len(created_tasks)} queued tasks created")
+    return created_tasks
+
+def main(use_async=False, workers=0, force=False, offline=False, flush=False):
     """
     Main entry point of the script
     """
@@ -426,7 +1035,7 @@ def main():
         logger.info("Starting Notion Task Scheduler")
         
         # Check for required environment variables
-        if not NOTION_API_TOKEN:
+        if not NOTION_API_TOKEN and not offline:
             logger.error("Missing NOTION_API_TOKEN environment variable. Cannot continue.")
             return []
             
@@ -435,7 +1044,14 @@ def main():
             return []
         
         # Run the task scheduling
-        created_tasks = schedule_tasks()
+        if offline:
+            created_tasks = schedule_tasks_offline()
+        elif flush:
+            created_tasks = flush_outbox(workers=workers)
+        elif use_async:
+            created_tasks = asyncio.run(async_schedule_tasks(force=force))
+        else:
+            created_tasks = schedule_tasks(workers=workers, force=force)
         
         # Log success
         logger.info(f"Script completed successfully. Created {len(created_tasks)} scheduled tasks.")
@@ -446,8 +1062,16 @@ def main():
         return []
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schedule Quick win templates for the rest of the month")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="create tasks concurrently with asyncio")
+    parser.add_argument("--workers", type=int, default=0, help="create tasks from a thread pool of N workers")
+    parser.add_argument("--force", action="store_true", help="schedule even if nothing changed since the last run")
+    parser.add_argument("--offline", action="store_true", help="plan from the local mirror and queue creates in the outbox")
+    parser.add_argument("--flush-outbox", dest="flush", action="store_true", help="create the tasks queued in the outbox")
+    args = parser.parse_args()
+    
     try:
-        result = main()
+        result = main(use_async=args.use_async, workers=args.workers, force=args.force, offline=args.offline, flush=args.flush)
         logger.info(f"Script completed. Created {len(result)} tasks.")
     except Exception as e:
         logger.exception(f"Unhandled exception in script: {str(e)}")
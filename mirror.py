@@ -0,0 +1,229 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from notion_client import DEFAULT_PAGE_SIZE
+
+logger = logging.getLogger('notion_mirror')
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY,
+    task_type TEXT,
+    date TEXT,
+    done INTEGER,
+    last_edited_time TEXT,
+    properties TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_task_type ON pages (task_type, date);
+CREATE INDEX IF NOT EXISTS pages_date ON pages (date);
+CREATE INDEX IF NOT EXISTS pages_done ON pages (done);
+CREATE INDEX IF NOT EXISTS pages_last_edited_time ON pages (last_edited_time);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def page_columns(page):
+    """
+    Extract the indexed column values from a Notion page object
+    """
+    properties = page.get("properties", {})
+
+    task_type = (properties.get("Task Type", {}).get("select") or {}).get("name")
+
+    task_date = None
+    date_prop = properties.get("Date", {}).get("date") or {}
+    if date_prop.get("start"):
+        task_date = date_prop["start"].split("T")[0]  # Extract just the date part
+
+    done = properties.get("Done", {}).get("checkbox")
+
+    return (
+        page["id"],
+        task_type,
+        task_date,
+        None if done is None else int(done),
+        page.get("last_edited_time"),
+        json.dumps(properties)
+    )
+
+
+class NotionMirror:
+    """
+    Local SQLite copy of the Notion database, kept current by incremental sync
+
+    Queries never return archived pages, so pages archived outside these scripts
+    are only dropped by a full sync. Archives made by clear.py are applied locally.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Shared between the bootstrap and worker threads, serialised by the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA_SQL)
+
+    def close(self):
+        self.connection.close()
+
+    def get_state(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def upsert_pages(self, pages):
+        """
+        Insert or replace pages, e.g. from a query page or a create response
+        """
+        rows = [page_columns(page) for page in pages if page.get("id")]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO pages (id, task_type, date, done, last_edited_time, properties) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET task_type = excluded.task_type, date = excluded.date, "
+                "done = excluded.done, last_edited_time = excluded.last_edited_time, "
+                "properties = excluded.properties",
+                rows
+            )
+        return len(rows)
+
+    def remove_page(self, page_id):
+        """
+        Drop a page that was archived in Notion
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+
+    def sync(self, client, database_id, full=False):
+        """
+        Fetch pages edited since the last sync cursor (or everything when full) into the mirror
+
+        Notion rounds last_edited_time to the minute, so the boundary minute is
+        fetched again; upserts make that harmless.
+        """
+        url = f"databases/{database_id}/query"
+        cursor = None if full else self.get_state("last_edited_time")
+
+        payload = {
+            "sorts": [
+                {
+                    "timestamp": "last_edited_time",
+                    "direction": "ascending"
+                }
+            ]
+        }
+        if cursor:
+            payload["filter"] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {
+                    "on_or_after": cursor
+                }
+            }
+
+        logger.info(f"Syncing mirror {self.path} ({'full' if not cursor else f'since {cursor}'})")
+
+        synced = 0
+        seen_ids = set()
+        latest = cursor
+        for results in client.query_pages(url, payload, page_size=DEFAULT_PAGE_SIZE):
+            synced += self.upsert_pages(results)
+            for page in results:
+                seen_ids.add(page["id"])
+                if page.get("last_edited_time") and (latest is None or page["last_edited_time"] > latest):
+                    latest = page["last_edited_time"]
+
+        if not cursor:
+            # A full sync sees every live page, so anything else was archived or deleted
+            with self.lock, self.connection:
+                stale = [row[0] for row in self.connection.execute("SELECT id FROM pages") if row[0] not in seen_ids]
+                self.connection.executemany("DELETE FROM pages WHERE id = ?", [(page_id,) for page_id in stale])
+            if stale:
+                logger.info(f"Removed {len(stale)} pages no longer in Notion from the mirror")
+
+        if latest:
+            self.set_state("last_edited_time", latest)
+
+        logger.info(f"Mirror sync complete: {synced} pages updated")
+        return synced
+
+    def refresh(self, client, database_id, full_sync_interval):
+        """
+        Incrementally sync, falling back to a full sync once every full_sync_interval seconds
+        """
+        last_full_sync = float(self.get_state("full_synced_at") or 0)
+        full = time.time() - last_full_sync >= full_sync_interval
+        synced = self.sync(client, database_id, full=full)
+        if full:
+            self.set_state("full_synced_at", str(time.time()))
+        return synced
+
+    def _pages(self, sql, params):
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [
+            {"object": "page", "id": page_id, "last_edited_time": last_edited_time, "properties": json.loads(properties)}
+            for page_id, last_edited_time, properties in rows
+        ]
+
+    def pages_without_date(self, task_type):
+        """
+        Pages of a task type with an empty Date, shaped like query results
+        """
+        return self._pages(
+            "SELECT id, last_edited_time, properties FROM pages WHERE task_type = ? AND date IS NULL ORDER BY rowid",
+            (task_type,)
+        )
+
+    def pages_with_date(self, task_type):
+        """
+        Pages of a task type with a Date set, shaped like query results
+        """
+        return self._pages(
+            "SELECT id, last_edited_time, properties FROM pages WHERE task_type = ? AND date IS NOT NULL ORDER BY rowid",
+            (task_type,)
+        )
+
+    def count_tasks_by_date(self, start_date_str, end_date_str):
+        """
+        Number of pages per date in an inclusive ISO date range
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT date, COUNT(*) FROM pages WHERE date BETWEEN ? AND ? GROUP BY date",
+                (start_date_str, end_date_str)
+            ).fetchall()
+        tasks_by_date = defaultdict(int)
+        for task_date, count in rows:
+            tasks_by_date[task_date] = count
+        return tasks_by_date
+
+
+def open_mirror(path, client, database_id, full_sync_interval):
+    """
+    Open and refresh the mirror at path, or return None if it cannot be brought up to date
+    """
+    try:
+        mirror = NotionMirror(path)
+        mirror.refresh(client, database_id, full_sync_interval)
+        return mirror
+    except Exception as e:
+        logger.exception(f"Could not sync mirror {path}, falling back to the API: {str(e)}")
+        return None
@@ -0,0 +1,344 @@
+import logging
+import queue
+import random
+import threading
+import time
+from urllib.parse import unquote
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger('notion_client')
+
+# Notion API endpoint and version shared by all scripts
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# Connection defaults
+DEFAULT_POOL_SIZE = 10  # Maximum number of keep-alive connections to api.notion.com
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) timeout in seconds
+
+# Rate limiting defaults (Notion allows an average of ~3 requests per second)
+DEFAULT_RATE = 3.0  # Average requests per second
+DEFAULT_BURST = 3  # Requests that may be sent back-to-back after an idle period
+
+# Retry defaults
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# A 500, 502 or 504 may come back after the page was created, so writes only retry rejections
+WRITE_RETRYABLE_STATUS_CODES = {429, 503}
+DEFAULT_READ_RETRIES = 5  # Retries per idempotent call (GET, queries, archiving)
+DEFAULT_WRITE_RETRIES = 2  # Retries per non-idempotent call (page creation)
+DEFAULT_RUN_RETRIES = 50  # Retries allowed across all calls of one client
+DEFAULT_BACKOFF_BASE = 0.5  # Seconds, doubled after every failed attempt
+DEFAULT_BACKOFF_MAX = 30.0  # Upper bound for a single backoff delay in seconds
+
+# Pagination defaults
+DEFAULT_PAGE_SIZE = 100  # Largest page size the Notion query endpoint accepts
+
+
+class NotionAPIError(Exception):
+    """
+    Raised by paginated helpers when Notion answers with a non-200 status
+    """
+
+    def __init__(self, status_code, body):
+        super().__init__(f"Notion API error {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+def prefetch(iterable, buffer_size=1):
+    """
+    Start consuming iterable in a background thread and return an iterator over its items
+
+    Up to buffer_size items are fetched ahead of the consumer. Exceptions raised by
+    the iterable are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=buffer_size)
+    finished = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except Exception as e:
+            items.put((finished, e))
+        else:
+            items.put((finished, None))
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+
+    def consume():
+        while True:
+            item, error = items.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+
+    return consume()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting the average request rate with a bounded burst
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """
+        Take one token and return how many seconds the caller must wait before using it
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            # Negative balance means the token is borrowed from the future
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """
+        Block until a request may be sent
+        """
+        wait = self.reserve()
+        if wait > 0:
+            logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, honouring Retry-After, with per-call and per-run caps
+    """
+
+    def __init__(
+        self,
+        read_retries=DEFAULT_READ_RETRIES,
+        write_retries=DEFAULT_WRITE_RETRIES,
+        run_retries=DEFAULT_RUN_RETRIES,
+        backoff_base=DEFAULT_BACKOFF_BASE,
+        backoff_max=DEFAULT_BACKOFF_MAX
+    ):
+        self.read_retries = read_retries
+        self.write_retries = write_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.remaining = run_retries
+        self.lock = threading.Lock()
+
+    def max_retries(self, idempotent):
+        return self.read_retries if idempotent else self.write_retries
+
+    def retryable(self, status_code, idempotent):
+        """
+        Whether a response status may be retried for this kind of call
+        """
+        if idempotent:
+            return status_code in RETRYABLE_STATUS_CODES
+        return status_code in WRITE_RETRYABLE_STATUS_CODES
+
+    def take(self, attempt, idempotent):
+        """
+        Consume one retry if both the per-call and the per-run budgets allow it
+        """
+        if attempt >= self.max_retries(idempotent):
+            return False
+        with self.lock:
+            if self.remaining <= 0:
+                logger.warning("Run retry budget exhausted, giving up on retries")
+                return False
+            self.remaining -= 1
+            return True
+
+    def delay(self, attempt, response=None):
+        """
+        Seconds to wait before the next attempt, never more than backoff_max
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(self.backoff_max, max(0.0, float(retry_after)))
+                except ValueError:
+                    logger.warning(f"Ignoring unparseable Retry-After header: {retry_after}")
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class NotionClient:
+    """
+    Notion API client that reuses pooled keep-alive connections for every call
+    """
+
+    def __init__(
+        self,
+        token,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        rate_limiter=None,
+        retry_policy=None,
+        cassette=None
+    ):
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cassette = cassette
+
+        # Notion API headers
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        }
+
+        # One session per client so TCP+TLS handshakes are paid once per connection
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.pool_size = 0
+        self.ensure_pool_size(pool_size)
+
+        logger.debug(f"Notion client created (pool size: {pool_size}, timeout: {timeout})")
+
+    def ensure_pool_size(self, pool_size):
+        """
+        Keep at least pool_size connections alive, so that many concurrent callers never open throwaway ones
+        """
+        if pool_size <= self.pool_size:
+            return
+        # Connections of a replaced adapter are closed once their requests finish
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.pool_size = pool_size
+
+    def url(self, path):
+        """
+        Build a full API URL from a path, leaving absolute URLs untouched
+        """
+        if path.startswith("http"):
+            return path
+        return f"{NOTION_API_URL}/{path.lstrip('/')}"
+
+    def _send(self, method, url, kwargs):
+        """
+        Send one request, or serve it from the cassette when replaying
+        """
+        if self.cassette is not None and self.cassette.replaying:
+            entry = self.cassette.play(method, url, kwargs)
+            delay = self.cassette.delay(entry)
+            if delay > 0:
+                time.sleep(delay)
+
+            response = requests.Response()
+            response.status_code = entry["status"]
+            response.headers = CaseInsensitiveDict(entry["headers"])
+            response._content = entry["text"].encode("utf-8")
+            response.encoding = "utf-8"
+            response.url = url
+            return response
+
+        # Replayed responses never reach the API, so only live requests are rate limited
+        self.rate_limiter.acquire()
+        response = self.session.request(method, url, **kwargs)
+        if self.cassette is not None:
+            self.cassette.record(
+                method, url, kwargs, response.status_code, response.headers, response.text,
+                response.elapsed.total_seconds()
+            )
+        return response
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a rate-limited request through the pooled session, retrying 429 and 5xx responses
+
+        Calls default to idempotent only for GET. Non-idempotent calls are not retried after
+        errors that may have reached the server (read timeouts, dropped connections, 500,
+        502 and 504 responses); they only retry 429 and 503.
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, url, kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or not self.retry_policy.take(attempt, idempotent):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.warning(f"{method} {url} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if not self.retry_policy.retryable(response.status_code, idempotent):
+                    return response
+                if not self.retry_policy.take(attempt, idempotent):
+                    return response
+                delay = self.retry_policy.delay(attempt, response)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def query_pages(self, path, payload, page_size=DEFAULT_PAGE_SIZE, filter_properties=None):
+        """
+        Yield the results of a database query page by page, following next_cursor
+
+        filter_properties is an optional list of property IDs; only those property
+        values are returned for each page.
+        """
+        body = dict(payload, page_size=page_size)
+
+        # Property IDs come percent-encoded from the API and are encoded again by requests
+        params = None
+        if filter_properties:
+            params = [("filter_properties", unquote(prop_id)) for prop_id in filter_properties]
+
+        while True:
+            response = self.post(path, json=body, params=params, idempotent=True)
+            data = response.json()
+
+            if response.status_code != 200:
+                raise NotionAPIError(response.status_code, data)
+
+            yield data.get("results", [])
+
+            if not data.get("has_more") or not data.get("next_cursor"):
+                return
+            body["start_cursor"] = data["next_cursor"]
+
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,146 @@
+import os
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger('occupancy_index')
+
+
+def occupancy_index_path(cache_dir, database_id):
+    """
+    Path of the per-day occupancy index for one database
+    """
+    return os.path.join(cache_dir, f"occupancy_{database_id}.json")
+
+
+class OccupancyIndex:
+    """
+    Persistent count of tasks per date, updated from creates and archives
+
+    Counts inside the covered range are authoritative as of the last reconciling
+    scan. Creates and archives made by these scripts are applied as they happen.
+    Edits made elsewhere make the index stale: edit_cursor is the latest
+    last_edited_time seen when it was reconciled and known_edits maps the pages
+    edited since then to the last_edited_time the index accounts for, so any
+    other page, or a known page edited again later, means a new scan is needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.covered_start = None
+        self.covered_end = None
+        self.reconciled_at = 0
+        self.edit_cursor = None
+        self.known_edits = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.counts = {task_date: int(count) for task_date, count in data.get("counts", {}).items()}
+            self.covered_start = data.get("covered_start")
+            self.covered_end = data.get("covered_end")
+            self.reconciled_at = data.get("reconciled_at", 0)
+            self.edit_cursor = data.get("edit_cursor")
+            self.known_edits = dict(data.get("known_edits", {}))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable occupancy index {self.path}: {str(e)}")
+
+    def _save(self):
+        data = {
+            "covered_start": self.covered_start,
+            "covered_end": self.covered_end,
+            "reconciled_at": self.reconciled_at,
+            "edit_cursor": self.edit_cursor,
+            "known_edits": self.known_edits,
+            "counts": self.counts
+        }
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not write occupancy index {self.path}: {str(e)}")
+
+    def covers(self, start_date_str, end_date_str, ttl):
+        """
+        Whether the index was reconciled for this inclusive range within the last ttl seconds
+        """
+        with self.lock:
+            if not self.covered_start or time.time() - self.reconciled_at >= ttl:
+                return False
+            return self.covered_start <= start_date_str and end_date_str <= self.covered_end
+
+    def accounts_for(self, edited_pages):
+        """
+        Whether every page edited since the cursor (id -> last_edited_time, None when unknown) was seen by the index in its current state
+        """
+        if edited_pages is None:
+            return False
+        with self.lock:
+            for page_id, last_edited_time in edited_pages.items():
+                known_edit = self.known_edits.get(page_id)
+                if known_edit is None or not last_edited_time or last_edited_time > known_edit:
+                    return False
+            return True
+
+    def get_counts(self, start_date_str, end_date_str):
+        """
+        Task counts per date within an inclusive ISO date range
+        """
+        tasks_by_date = defaultdict(int)
+        with self.lock:
+            for task_date, count in self.counts.items():
+                if start_date_str <= task_date <= end_date_str and count > 0:
+                    tasks_by_date[task_date] = count
+        return tasks_by_date
+
+    def reconcile(self, start_date_str, end_date_str, tasks_by_date, edit_cursor=None, edited_pages=None):
+        """
+        Replace the counts of an inclusive range with the result of a full scan
+
+        edit_cursor and edited_pages describe the edits read just before the scan;
+        without them the index is never trusted over a scan.
+        """
+        with self.lock:
+            self.counts = {
+                task_date: count for task_date, count in self.counts.items()
+                if not start_date_str <= task_date <= end_date_str
+            }
+            self.counts.update({task_date: count for task_date, count in tasks_by_date.items() if count > 0})
+            self.covered_start = start_date_str
+            self.covered_end = end_date_str
+            self.reconciled_at = time.time() if edited_pages is not None else 0
+            self.edit_cursor = edit_cursor
+            self.known_edits = dict(edited_pages or {})
+            self._save()
+
+    def add(self, date_str, delta, page_id=None, last_edited_time=None):
+        """
+        Apply one create (+1) or archive (-1) of a page on a date
+
+        last_edited_time comes from the create or archive response, so later edits
+        to the same page are told apart from this one.
+        """
+        with self.lock:
+            if page_id and last_edited_time:
+                self.known_edits[page_id] = last_edited_time
+            count = max(0, self.counts.get(date_str, 0) + delta)
+            if count:
+                self.counts[date_str] = count
+            else:
+                self.counts.pop(date_str, None)
+            self._save()
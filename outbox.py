@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger('outbox')
+
+
+class Outbox:
+    """
+    Durable append-only queue of planned create payloads
+
+    Entries are JSON lines in `path`; the ids of entries already sent or dropped are
+    appended to `path.sent`, so an interrupted flush resumes without sending anything twice.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sent_path = f"{path}.sent"
+        self.lock = threading.Lock()
+
+    def _append_lines(self, path, lines):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, entries):
+        """
+        Durably queue entries (dicts with at least "id", "date" and "body")
+        """
+        if not entries:
+            return
+        with self.lock:
+            self._append_lines(self.path, [json.dumps(entry) for entry in entries])
+        logger.info(f"Queued {len(entries)} tasks in outbox {self.path}")
+
+    def _sent_ids(self):
+        if not os.path.exists(self.sent_path):
+            return set()
+        with open(self.sent_path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def pending(self):
+        """
+        Entries not sent yet, in the order they were queued
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        with self.lock:
+            sent_ids = self._sent_ids()
+            entries = []
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash while appending
+                        logger.warning(f"Skipping unreadable outbox line in {self.path}")
+                        continue
+                    if entry.get("id") not in sent_ids:
+                        entries.append(entry)
+            return entries
+
+    def pending_counts_by_date(self, since=None):
+        """
+        Number of queued but unsent tasks per date, leaving out dates before `since`
+        """
+        counts = defaultdict(int)
+        for entry in self.pending():
+            if since is None or entry["date"] >= since:
+                counts[entry["date"]] += 1
+        return counts
+
+    def mark_sent(self, entry_id):
+        """
+        Durably record that an entry was created in Notion
+        """
+        with self.lock:
+            self._append_lines(self.sent_path, [entry_id])
+
+    def drop(self, entries):
+        """
+        Durably discard entries that must not be sent, e.g. because their date has passed
+        """
+        if not entries:
+            return
+        with self.lock:
+            self._append_lines(self.sent_path, [entry["id"] for entry in entries])
+        logger.info(f"Dropped {len(entries)} tasks from outbox {self.path}")
+
+    def compact(self):
+        """
+        Remove the outbox files once every entry has been sent
+        """
+        if self.pending():
+            return False
+        with self.lock:
+            for path in (self.path, self.sent_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return True
@@ -0,0 +1,248 @@
+import heapq
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from day_capacity import DayCapacityIndex, DayLoadTree, existing_loads
+
+logger = logging.getLogger('planner')
+
+
+def occurrence_step(template):
+    """
+    Days between two occurrences of a template
+
+    Adding timedelta(days=regularity) to a date drops fractional days, so a
+    regularity of 2.5 repeats every 2 days, and anything below 1 every day.
+    """
+    return max(1, int(template.regularity))
+
+
+def plan_schedule(templates, start_date, end_date, existing_tasks_by_date, max_tasks_per_day, level_days=0, backend="heap"):
+    """
+    Plan the occurrences of all templates together, earliest due date first
+
+    Each template is due on start_date + k * regularity up to end_date. A heap of
+    (due date, finish tag, occurrences placed, template index) events is popped in
+    date order. On ties the template with the smallest weighted-fair-queueing finish
+    tag, (placed + 1) / weight, goes first, so when the cap binds the slots are
+    shared in proportion to the weights rather than by query order. Occurrences on
+    full days are skipped. Runs in O(occurrences * log templates) and leaves its
+    inputs untouched.
+
+    With level_days > 0 occurrences may move around their slot instead, see
+    plan_levelled_schedule. backend="numpy" computes the same plan with
+    plan_schedule_numpy.
+
+    Returns a list of (template, due date) pairs in date order.
+    """
+    if level_days > 0:
+        return plan_levelled_schedule(templates, start_date, end_date, existing_tasks_by_date, max_tasks_per_day, level_days)
+    if backend == "numpy":
+        return plan_schedule_numpy(templates, start_date, end_date, existing_tasks_by_date, max_tasks_per_day)
+
+    capacity = DayCapacityIndex(start_date, end_date, max_tasks_per_day, existing_tasks_by_date)
+
+    steps = [occurrence_step(template) for template in templates]
+    weights = [template.weight for template in templates]
+
+    heap = [(start_date, 1 / weights[index], 0, index) for index in range(len(templates))]
+    heapq.heapify(heap)
+
+    planned_tasks = []
+    while heap:
+        due_date, finish_tag, placed, index = heap[0]
+        template = templates[index]
+        step = steps[index]
+
+        # Jump straight to the next occurrence date that still has room
+        free_date = capacity.next_free(due_date, step)
+
+        if free_date is None:
+            skipped = (end_date - due_date).days // step + 1
+            logger.info(f"Skipping {skipped} dates from {due_date} for {template.name} - daily limit of {max_tasks_per_day} reached")
+            heapq.heappop(heap)
+            continue
+
+        if free_date != due_date:
+            skipped = (free_date - due_date).days // step
+            logger.info(f"Skipping {skipped} dates from {due_date} for {template.name} - daily limit of {max_tasks_per_day} reached")
+            # Other templates due before free_date get their turn first
+            heapq.heapreplace(heap, (free_date, finish_tag, placed, index))
+            continue
+
+        logger.info(f"Planning task {placed+1} for {template.name} on {due_date} (day has {capacity.load(due_date)}/{max_tasks_per_day} tasks)")
+        capacity.reserve(due_date)
+        planned_tasks.append((template, due_date))
+
+        next_date = due_date + timedelta(days=step)
+        if next_date > end_date:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (next_date, (placed + 2) / weights[index], placed + 1, index))
+
+    return planned_tasks
+
+
+def plan_levelled_schedule(templates, start_date, end_date, existing_tasks_by_date, max_tasks_per_day, level_days):
+    """
+    Plan all templates letting each occurrence move up to level_days from its slot to flatten daily load
+
+    Every occurrence starts out on its slot, so a segment tree over day loads
+    holds the uncapped loads of the plain plan. Occurrences are then taken in
+    date order and each moves to the least loaded day in its window if that day,
+    with the occurrence on it, is no more loaded than its slot without it. A move
+    never raises the highest load and never takes a task from a day within the
+    cap to one over it, so the levelled plan has no higher peak and drops no more
+    occurrences than the plain one. The shift stays below the regularity and an
+    occurrence has to land after the previous one of its template, so one
+    template never gets two tasks on a day and daily templates stay put. Days
+    over the cap keep their occurrences in weighted-fair-queueing order, as in
+    plan_schedule.
+
+    Returns a list of (template, due date) pairs in date order.
+    """
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return []
+
+    existing = existing_loads(start_date, days, existing_tasks_by_date)
+
+    occurrences = []
+    for index, template in enumerate(templates):
+        step = occurrence_step(template)
+        shift = min(level_days, step - 1)
+        for slot in range(0, days, step):
+            occurrences.append((slot, index, shift))
+    occurrences.sort()
+
+    loads = list(existing)
+    for slot, _, _ in occurrences:
+        loads[slot] += 1
+    loads = DayLoadTree(loads)
+
+    last_offsets = [-1] * len(templates)
+    due_by_day = [[] for _ in range(days)]
+    for slot, index, shift in occurrences:
+        offset = slot
+        if shift:
+            loads.add(slot, -1)
+            load, offset = loads.min_load(max(slot - shift, last_offsets[index] + 1), min(slot + shift, days - 1))
+            # Only move off the regular slot for a strictly less loaded day
+            if load >= loads.load(slot):
+                offset = slot
+            loads.add(offset, 1)
+            if offset != slot:
+                logger.debug(f"Moving {templates[index].name} from {start_date + timedelta(days=slot)} to {start_date + timedelta(days=offset)}")
+        last_offsets[index] = offset
+        due_by_day[offset].append(index)
+
+    placed = [0] * len(templates)
+    planned_tasks = []
+    for offset, due in enumerate(due_by_day):
+        due_date = start_date + timedelta(days=offset)
+        room = max(0, max_tasks_per_day - existing[offset])
+
+        # Occurrences on one day go in weighted-fair-queueing order
+        due.sort(key=lambda index: ((placed[index] + 1) / templates[index].weight, placed[index], index))
+        for index in due[room:]:
+            logger.info(f"Skipping {templates[index].name} on {due_date} - daily limit of {max_tasks_per_day} reached")
+
+        for load, index in enumerate(due[:room], start=existing[offset]):
+            logger.info(f"Planning task {placed[index]+1} for {templates[index].name} on {due_date} (day has {load}/{max_tasks_per_day} tasks)")
+            placed[index] += 1
+            planned_tasks.append((templates[index], due_date))
+
+    return planned_tasks
+
+
+def plan_schedule_numpy(templates, start_date, end_date, existing_tasks_by_date, max_tasks_per_day):
+    """
+    NumPy version of plan_schedule for large template sets and long horizons
+
+    Returns the same occurrences as plan_schedule, in date order. The planning
+    itself is done by plan_occurrence_arrays, which capacity studies can call
+    directly to skip building date objects.
+    """
+    # Imported here so the default planner does not require numpy
+    import numpy as np
+
+    days = (end_date - start_date).days + 1
+    if not templates or days <= 0:
+        return []
+
+    steps = np.array([occurrence_step(template) for template in templates], dtype=np.int64)
+    weights = np.array([template.weight for template in templates], dtype=np.float64)
+    existing = np.array(existing_loads(start_date, days, existing_tasks_by_date), dtype=np.int64)
+
+    occurrence_days, occurrence_templates = plan_occurrence_arrays(steps, weights, existing, max_tasks_per_day)
+
+    dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    return [
+        (templates[index], dates[day])
+        for day, index in zip(occurrence_days.tolist(), occurrence_templates.tolist())
+    ]
+
+
+def plan_occurrence_arrays(steps, weights, existing, max_tasks_per_day):
+    """
+    Vectorized planning over day offsets 0 .. len(existing) - 1
+
+    steps and weights are per-template arrays and existing holds the tasks
+    already on each day. A template's due days never change (skipped occurrences
+    are dropped, not moved), so all occurrences are generated at once and counted
+    per day. Only contended days, where more templates are due than the cap
+    leaves room for, are visited one by one: the due templates are ranked by
+    their weighted-fair-queueing finish tag and those past the free slots are
+    masked out.
+
+    Returns (day offsets, template indices) of the planned occurrences sorted by
+    day, then template.
+    """
+    # Imported here so the default planner does not require numpy
+    import numpy as np
+
+    days = len(existing)
+    room = np.maximum(max_tasks_per_day - existing, 0)
+
+    # Every occurrence as (day offset, template index), grouped by template
+    occurrence_counts = (days - 1) // steps + 1
+    occurrence_templates = np.repeat(np.arange(len(steps)), occurrence_counts)
+    first_occurrence = np.concatenate(([0], np.cumsum(occurrence_counts)[:-1]))
+    occurrence_days = (np.arange(occurrence_templates.size) - first_occurrence[occurrence_templates]) * steps[occurrence_templates]
+
+    due_by_day = np.bincount(occurrence_days, minlength=days)
+    contended_days = np.flatnonzero(due_by_day > room)
+
+    keep = np.ones(occurrence_days.size, dtype=bool)
+    skipped = np.zeros(len(steps), dtype=np.int64)
+    indices = np.arange(len(steps))
+    for day in contended_days:
+        due = indices[day % steps == 0]
+
+        # Occurrences placed so far: earlier due days minus the skipped ones
+        placed = (day + steps[due] - 1) // steps[due] - skipped[due]
+        finish_tags = (placed + 1) / weights[due]
+        ranked = due[np.lexsort((due, placed, finish_tags))]
+
+        dropped = ranked[room[day]:]
+        skipped[dropped] += 1
+        keep[first_occurrence[dropped] + day // steps[dropped]] = False
+        logger.debug(f"Skipping {dropped.size} of {ranked.size} tasks due on day {day} - daily limit of {max_tasks_per_day} reached")
+
+    logger.info(f"Planned {int(keep.sum())} of {keep.size} occurrences, {contended_days.size} of {days} days contended")
+
+    occurrence_days = occurrence_days[keep]
+    occurrence_templates = occurrence_templates[keep]
+    # Occurrences are grouped by template, so a stable sort by day keeps template order within a day
+    order = np.argsort(occurrence_days, kind="stable")
+    return occurrence_days[order], occurrence_templates[order]
+
+
+def count_planned_by_date(planned_tasks):
+    """
+    Number of planned tasks per ISO date
+    """
+    tasks_by_date = defaultdict(int)
+    for _, due_date in planned_tasks:
+        tasks_by_date[due_date.strftime("%Y-%m-%d")] += 1
+    return tasks_by_date
@@ -0,0 +1,57 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger('run_fingerprint')
+
+
+def run_fingerprint_path(cache_dir, database_id):
+    """
+    Path of the stored fingerprint of the last successful scheduling run
+    """
+    return os.path.join(cache_dir, f"run_fingerprint_{database_id}.json")
+
+
+def load_run_fingerprint(cache_dir, database_id):
+    """
+    Load the fingerprint of the last successful run, or None if there is none
+    """
+    path = run_fingerprint_path(cache_dir, database_id)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable run fingerprint {path}: {str(e)}")
+        return None
+
+
+def save_run_fingerprint(cache_dir, database_id, fingerprint):
+    """
+    Store the fingerprint of a successful run
+    """
+    path = run_fingerprint_path(cache_dir, database_id)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fingerprint, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not write run fingerprint {path}: {str(e)}")
+
+
+def clear_run_fingerprint(cache_dir, database_id):
+    """
+    Forget the last run so the next one does a full scheduling pass
+    """
+    path = run_fingerprint_path(cache_dir, database_id)
+
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except Exception as e:
+        logger.warning(f"Could not remove run fingerprint {path}: {str(e)}")
@@ -0,0 +1,67 @@
+import os
+import json
+import logging
+import time
+
+logger = logging.getLogger('schema_cache')
+
+
+def schema_cache_path(cache_dir, database_id):
+    """
+    Path of the cached schema file for one database
+    """
+    return os.path.join(cache_dir, f"schema_{database_id}.json")
+
+
+def load_schema_cache(cache_dir, database_id):
+    """
+    Load the cached database properties, or None if there is no usable cache entry
+
+    The entry holds the raw `properties` object, the database's `last_edited_time`
+    and `fetched_at`, the Unix time it was last confirmed against the API.
+    """
+    path = schema_cache_path(cache_dir, database_id)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("database_id") != database_id or not entry.get("properties"):
+            return None
+        return entry
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable schema cache {path}: {str(e)}")
+        return None
+
+
+def save_schema_cache(cache_dir, database_id, last_edited_time, properties):
+    """
+    Store the database properties together with the database's last_edited_time
+    """
+    path = schema_cache_path(cache_dir, database_id)
+    entry = {
+        "database_id": database_id,
+        "last_edited_time": last_edited_time,
+        "fetched_at": time.time(),
+        "properties": properties
+    }
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return entry
+    except Exception as e:
+        logger.warning(f"Could not write schema cache {path}: {str(e)}")
+        return entry
+
+
+def is_fresh(entry, ttl):
+    """
+    Whether a cache entry was confirmed against the API less than ttl seconds ago
+    """
+    return entry is not None and time.time() - entry.get("fetched_at", 0) < ttl
@@ -0,0 +1,45 @@
+from occupancy_index import OccupancyIndex
+
+CURSOR = "2026-10-09T08:00:00.000Z"
+CREATED = "2026-10-09T09:00:00.000Z"
+MOVED = "2026-10-09T10:00:00.000Z"
+
+
+def reconciled_index(tmp_path):
+    """
+    Index reconciled with a full 10-10 and two tasks on 10-11, then one of our creates on 10-10
+    """
+    index = OccupancyIndex(str(tmp_path / "occupancy.json"))
+    index.reconcile("2026-10-01", "2026-10-31", {"2026-10-10": 2, "2026-10-11": 2}, CURSOR, {"latest": CURSOR})
+    index.add("2026-10-10", 1, "ours", CREATED)
+    return index
+
+
+def test_own_creates_keep_the_index_usable(tmp_path):
+    index = reconciled_index(tmp_path)
+    assert index.accounts_for({"latest": CURSOR, "ours": CREATED})
+
+
+def test_user_moving_our_page_makes_the_index_stale(tmp_path):
+    index = reconciled_index(tmp_path)
+    # Someone moved our task from the full 10-10 to 10-11 after we created it
+    assert not index.accounts_for({"latest": CURSOR, "ours": MOVED})
+
+
+def test_edit_to_the_reconciled_latest_page_makes_the_index_stale(tmp_path):
+    index = reconciled_index(tmp_path)
+    assert not index.accounts_for({"latest": MOVED, "ours": CREATED})
+
+
+def test_unknown_pages_make_the_index_stale(tmp_path):
+    index = reconciled_index(tmp_path)
+    assert not index.accounts_for({"latest": CURSOR, "ours": CREATED, "theirs": MOVED})
+    assert not index.accounts_for(None)
+
+
+def test_known_edits_survive_a_reload(tmp_path):
+    reconciled_index(tmp_path)
+    index = OccupancyIndex(str(tmp_path / "occupancy.json"))
+    assert index.accounts_for({"latest": CURSOR, "ours": CREATED})
+    assert not index.accounts_for({"latest": CURSOR, "ours": MOVED})
+    assert index.get_counts("2026-10-10", "2026-10-11") == {"2026-10-10": 3, "2026-10-11": 2}
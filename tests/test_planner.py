@@ -0,0 +1,154 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from codec import TemplateTask
+from day_capacity import DayCapacityIndex, DayLoadTree
+from planner import count_planned_by_date, plan_schedule
+
+START = date(2026, 10, 1)
+
+
+def random_case(rng):
+    """
+    Random templates, window, existing counts and cap for property checks
+    """
+    start = START + timedelta(days=rng.randint(0, 300))
+    end = start + timedelta(days=rng.randint(-1, 80))
+    templates = [
+        TemplateTask(str(index), f"T{index}", rng.choice([1, 1, 2, 3, 7, 14, 2.5]), weight=rng.choice([1, 1, 2, 0.5, 3]))
+        for index in range(rng.randint(0, 30))
+    ]
+    existing = {
+        (start + timedelta(days=offset)).isoformat(): rng.randint(0, 5)
+        for offset in range(90)
+        if rng.random() < 0.3
+    }
+    return templates, start, end, existing, rng.randint(1, 6)
+
+
+def test_next_free_matches_linear_scan():
+    rng = random.Random(1)
+    for _ in range(200):
+        days = rng.randint(1, 60)
+        capacity = rng.randint(1, 4)
+        existing = {(START + timedelta(days=offset)).isoformat(): rng.randint(0, 5) for offset in range(days)}
+        index = DayCapacityIndex(START, START + timedelta(days=days - 1), capacity, existing)
+        loads = [existing[(START + timedelta(days=offset)).isoformat()] for offset in range(days)]
+
+        for _ in range(40):
+            step = rng.choice([1, 2, 3, 7])
+            offset = rng.randrange(days)
+            expected = next((day for day in range(offset, days, step) if loads[day] < capacity), None)
+
+            free_date = index.next_free(START + timedelta(days=offset), step)
+            assert free_date == (None if expected is None else START + timedelta(days=expected))
+
+            if free_date is not None:
+                index.reserve(free_date)
+                loads[expected] += 1
+
+
+def test_min_load_matches_brute_force():
+    rng = random.Random(2)
+    for _ in range(200):
+        loads = [rng.randint(0, 5) for _ in range(rng.randint(1, 40))]
+        tree = DayLoadTree(loads)
+        for _ in range(20):
+            offset = rng.randrange(len(loads))
+            loads[offset] += 1
+            tree.add(offset, 1)
+
+            first = rng.randrange(len(loads))
+            last = rng.randrange(first, len(loads))
+            assert tree.min_load(first, last) == min((loads[day], day) for day in range(first, last + 1))
+
+
+@pytest.mark.parametrize("level_days", [0, 2])
+def test_contended_days_are_shared_by_weight(level_days):
+    templates = [TemplateTask("a", "a", 1, weight=2), TemplateTask("b", "b", 1), TemplateTask("c", "c", 1)]
+    planned = plan_schedule(templates, START, START + timedelta(days=29), {}, 2, level_days)
+    assert Counter(template.id for template, _ in planned) == {"a": 30, "b": 15, "c": 15}
+
+
+def test_equal_weights_do_not_favour_query_order():
+    templates = [TemplateTask(str(index), f"T{index}", 1) for index in range(10)]
+    planned = plan_schedule(templates, START, START + timedelta(days=30), {}, 3)
+    per_template = Counter(template.id for template, _ in planned)
+    assert max(per_template.values()) - min(per_template.values()) <= 1
+
+
+@pytest.mark.parametrize("level_days,backend", [(0, "heap"), (0, "numpy"), (3, "heap")])
+def test_daily_cap_is_never_exceeded(level_days, backend):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    rng = random.Random(3)
+    for _ in range(200):
+        templates, start, end, existing, cap = random_case(rng)
+        planned = plan_schedule(templates, start, end, existing, cap, level_days, backend)
+
+        for date_str, count in count_planned_by_date(planned).items():
+            assert start.isoformat() <= date_str <= end.isoformat()
+            assert existing.get(date_str, 0) + count <= cap
+
+        # A template never gets two tasks on one day
+        assert len({(template.id, due_date) for template, due_date in planned}) == len(planned)
+
+
+def peak_load(planned, existing, start, end):
+    """
+    Highest existing plus planned load of any day in the window
+    """
+    counts = count_planned_by_date(planned)
+    return max((
+        existing.get(day, 0) + counts.get(day, 0)
+        for day in ((start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1))
+    ), default=0)
+
+
+def test_levelling_never_raises_the_peak_or_drops_occurrences():
+    rng = random.Random(5)
+    for _ in range(1000):
+        templates, start, end, existing, cap = random_case(rng)
+        if rng.random() < 0.5:
+            cap = 10 ** 6
+        plain = plan_schedule(templates, start, end, existing, cap)
+        levelled = plan_schedule(templates, start, end, existing, cap, rng.randint(1, 5))
+
+        assert len(levelled) >= len(plain)
+        assert peak_load(levelled, existing, start, end) <= peak_load(plain, existing, start, end)
+
+
+def test_levelling_spreads_templates_due_together():
+    templates = [TemplateTask(str(index), f"T{index}", index % 3 + 1) for index in range(400)]
+    end = START + timedelta(days=91)
+    plain = plan_schedule(templates, START, end, {}, 10 ** 6)
+    levelled = plan_schedule(templates, START, end, {}, 10 ** 6, 3)
+
+    assert len(levelled) == len(plain)
+    assert peak_load(plain, {}, START, end) == 400
+    # Days 0-2 hold 801 occurrences whichever way they are spread
+    assert peak_load(levelled, {}, START, end) == 267
+
+
+def test_levelling_keeps_daily_templates_on_the_plain_plan():
+    rng = random.Random(6)
+    for _ in range(200):
+        templates, start, end, existing, cap = random_case(rng)
+        daily = [TemplateTask(template.id, template.name, 1, weight=template.weight) for template in templates]
+        assert plan_schedule(daily, start, end, existing, cap, 3) == plan_schedule(daily, start, end, existing, cap)
+
+
+def test_numpy_backend_matches_heap_planner():
+    pytest.importorskip("numpy")
+    rng = random.Random(4)
+    for _ in range(400):
+        templates, start, end, existing, cap = random_case(rng)
+        heap_plan = plan_schedule(templates, start, end, existing, cap)
+        numpy_plan = plan_schedule(templates, start, end, existing, cap, backend="numpy")
+
+        assert sorted((due_date, template.id) for template, due_date in numpy_plan) == \
+            sorted((due_date, template.id) for template, due_date in heap_plan)
+        assert [due_date for _, due_date in numpy_plan] == sorted(due_date for _, due_date in numpy_plan)